@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+from ctypes import sizeof
+
+BENCHMARKS_PATH = os.path.dirname(os.path.abspath(__file__))
+ROOT_PATH = os.path.join(BENCHMARKS_PATH, "..")
+# fake Teslasuit SDK is found before the real one
+sys.path.insert(0, os.path.join(BENCHMARKS_PATH, "fake_sdk"))
+sys.path.append(ROOT_PATH)
+
+from teslasuit_sdk import recorder
+import f1_client
+import ts_client
+from udp_sender import SyntheticSender
+
+DEFAULT_RATES = [60, 120, 240, 480, 1000, 2000, 4000]
+SETTLE_TIME_S = 0.5
+
+class PipelineRun:
+    # runs F1Client, TsClient and TsPlaylist against fake SDK while synthetic sender feeds the game socket
+    def __init__(self, rate, duration_s, use_haptic_worker, coalesce):
+        self.rate = rate
+        self.duration_s = duration_s
+        self.use_haptic_worker = use_haptic_worker
+        self.coalesce = coalesce
+        self.processed_packets = 0
+        self.latest_frame = None
+        # with haptic worker SDK calls are attributed to the oldest frame whose events were waiting in worker mailbox
+        self.pending_frame = None
+        self.dispatch_frame = None
+
+    def run(self):
+        recorder.reset()
+        self.f1_client = f1_client.F1Client()
+        self.ts_client = ts_client.TsClient()
+        self.f1_client.init(use_haptic_worker=self.use_haptic_worker, event_types=self.ts_client.get_event_types())
+        self.f1_client.set_event_callback(self.dispatch)
+        self.ts_client.init()
+        # playables are created before the run, so the first calls are not delayed by asset loading
+        self.ts_client.playlist.wait_assets()
+        # count processed packets and remember newest frame to attribute SDK calls to it
+        process_packet = self.f1_client.process_packet
+        def counting_process_packet(packet):
+            if packet.size < sizeof(f1_client.PacketHeader):
+                return
+            self.processed_packets += 1
+            self.latest_frame = packet.get_header().frameIdentifier
+            process_packet(packet)
+        self.f1_client.process_packet = counting_process_packet
+        if self.use_haptic_worker:
+            self.tag_worker_frames(self.f1_client.targets[0].haptic_worker.mailbox)
+
+        self.is_running = True
+        receiver = threading.Thread(None, self.receive, "Receiver")
+        receiver.start()
+        sender = SyntheticSender(self.rate, self.duration_s)
+        sender.start()
+        sender.join()
+        time.sleep(SETTLE_TIME_S)
+        self.is_running = False
+        # wake up receiver blocked on socket with a packet shorter than header
+        sender.socket.sendto(b"\0", sender.address)
+        receiver.join()
+        self.f1_client.stop()
+        self.f1_client.client.close()
+        return self.report(sender.send_times)
+
+    def receive(self):
+        while self.is_running:
+            if self.coalesce:
+                self.f1_client.process_latest()
+            else:
+                self.f1_client.process()
+
+    def tag_worker_frames(self, mailbox):
+        # frame of published events is passed to worker under mailbox lock, so frames received while worker dispatches are not mixed up
+        publish = mailbox.publish
+        take = mailbox.take
+        def tagged_publish(events):
+            with mailbox.condition:
+                if self.pending_frame == None:
+                    self.pending_frame = self.latest_frame
+                publish(events)
+        def tagged_take():
+            with mailbox.condition:
+                events = take()
+                self.dispatch_frame = self.pending_frame
+                self.pending_frame = None
+                return events
+        mailbox.publish = tagged_publish
+        mailbox.take = tagged_take
+
+    def dispatch(self, events):
+        # synchronous dispatch runs on receive thread right after the frame producing events
+        recorder.tag = self.dispatch_frame if self.use_haptic_worker else self.latest_frame
+        self.ts_client.process_ff_events(events)
+
+    def report(self, send_times):
+        sent_packets = len(send_times)
+        received_packets = self.processed_packets + self.f1_client.dropped_frames
+        # calls made by stale events stopping after sender finished are not caused by packets
+        end_time = send_times[-1] + f1_client.STOP_EVENTS_DELAY_S
+        latencies_ms = sorted((call_time - send_times[tag]) * 1000 for call_time, name, tag in recorder.calls if tag != None and tag < sent_packets and call_time < end_time)
+        playlist = self.ts_client.playlist
+        return {
+            "rate": self.rate,
+            "sent_packets": sent_packets,
+            "received_packets": received_packets,
+            "os_dropped_packets": sent_packets - received_packets,
+            "coalesced_packets": self.f1_client.dropped_frames,
+            "sustained_packets_per_s": received_packets / self.duration_s,
+            "sdk_calls": len(recorder.calls),
+            "sdk_calls_saved": playlist.sdk_calls_saved,
+            "sdk_calls_per_packet": len(recorder.calls) / max(received_packets, 1),
+            "latency_p50_ms": percentile(latencies_ms, 50),
+            "latency_p99_ms": percentile(latencies_ms, 99),
+            "latency_max_ms": latencies_ms[-1] if len(latencies_ms) > 0 else None,
+        }
+
+def percentile(sorted_values, percent):
+    if len(sorted_values) == 0:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))]
+
+def print_report(result):
+    print("rate %6d frames/s  sent %7d  received %7d  os dropped %6d  coalesced %6d  sdk calls/packet %.2f  latency p50 %s p99 %s max %s ms" % (
+        result["rate"], result["sent_packets"], result["received_packets"], result["os_dropped_packets"], result["coalesced_packets"],
+        result["sdk_calls_per_packet"], format_ms(result["latency_p50_ms"]), format_ms(result["latency_p99_ms"]), format_ms(result["latency_max_ms"])))
+
+def format_ms(value):
+    return "%.3f" % value if value != None else "-"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure latency and throughput of F1 client to Teslasuit pipeline with fake SDK")
+    parser.add_argument("--rates", type=float, nargs="+", default=DEFAULT_RATES, help="motion and telemetry packet pairs per second to run")
+    parser.add_argument("--duration", type=float, default=3, help="duration of each run in seconds")
+    parser.add_argument("--sdk-delay-ms", type=float, default=0, help="simulated duration of each SDK call")
+    parser.add_argument("--sync", action="store_true", help="dispatch events on receive thread instead of haptic worker")
+    parser.add_argument("--no-coalesce", action="store_true", help="process every packet instead of newest packet per type")
+    parser.add_argument("--output", metavar="PATH", help="results file, default is results/<time>.json")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    # ts_client loads assets relative to working directory
+    os.chdir(ROOT_PATH)
+    recorder.call_delay_s = args.sdk_delay_ms / 1000
+    results = list()
+    for rate in args.rates:
+        result = PipelineRun(rate, args.duration, not args.sync, not args.no_coalesce).run()
+        print_report(result)
+        results.append(result)
+    sustained = [result["rate"] for result in results if result["os_dropped_packets"] == 0]
+    print("Max rate without OS drops: %s frames/s" % (max(sustained) if len(sustained) > 0 else "-"))
+
+    output = args.output
+    if output == None:
+        os.makedirs(os.path.join(BENCHMARKS_PATH, "results"), exist_ok=True)
+        output = os.path.join(BENCHMARKS_PATH, "results", time.strftime("%Y%m%d-%H%M%S") + ".json")
+    config = {"duration_s": args.duration, "sdk_delay_ms": args.sdk_delay_ms, "haptic_worker": not args.sync, "coalesce": not args.no_coalesce}
+    with open(output, "w") as file:
+        json.dump({"config": config, "runs": results}, file, indent=2)
+    print("Results saved:", output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import os
+import sys
+import math
+import random
+import argparse
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+import f1_client
+import f1_analysis
+from f1_capture import CAPTURE_MAGIC, RECORD_HEADER, ReplaySource
+from f1_decoders import RuleProducer
+from ff_rules import RuleInput
+from f1_packets import PACKET_HEADERS, PacketId, PacketMotionData, PacketMotionData2023, CarMotionExData2024, PacketCarTelemetryData
+
+# Synthetic session is written in the oldest and the newest supported format with a flashback in the middle of each
+SYNTHETIC_FORMATS = (2022, 2024)
+SYNTHETIC_CARS = (3, 7, 5)
+PLAYER_CAR_INDEX = 3
+SECONDARY_PLAYER_CAR_INDEX = 7
+FLASHBACK_S = 5
+FRAME_S = 1 / 60
+OUTPUT_TOLERANCE = 1e-6
+
+def build_header(packet_format, packet_id, session_time, frame):
+    header = PACKET_HEADERS[packet_format]()
+    header.packetFormat = packet_format
+    header.packetVersion = 1
+    header.packetId = packet_id
+    header.sessionUID = packet_format
+    header.sessionTime = session_time
+    header.frameIdentifier = frame
+    header.playerCarIndex = PLAYER_CAR_INDEX
+    header.secondaryPlayerCarIndex = SECONDARY_PLAYER_CAR_INDEX
+    return bytes(header)
+
+def noisy_signal(frame, phase, amplitude, rng):
+    # slow sine with noise, so filters both pass and suppress threshold crossings
+    return amplitude * math.sin(frame / 50 + phase) + rng.gauss(0, amplitude * 0.3)
+
+def write_synthetic_capture(path, frames, seed=1):
+    rng = random.Random(seed)
+    with open(path, "wb") as file:
+        file.write(CAPTURE_MAGIC)
+        def write(packet, capture_time):
+            file.write(RECORD_HEADER.pack(capture_time, len(packet)))
+            file.write(packet)
+        capture_time = float(0)
+        for packet_format in SYNTHETIC_FORMATS:
+            session_time = float(0)
+            for i in range(frames):
+                if i == frames // 2:
+                    session_time -= FLASHBACK_S
+                session_time += FRAME_S
+                capture_time += FRAME_S
+                motion = PacketMotionData() if packet_format < 2023 else PacketMotionData2023()
+                for car in SYNTHETIC_CARS:
+                    motion.carMotionData[car].gForceLateral = noisy_signal(i, car, 1.5, rng)
+                    motion.carMotionData[car].gForceLongitudinal = noisy_signal(i, car + 1, 1.2, rng)
+                # wheel values are in Motion packet before 2023 and in MotionEx packet after
+                wheels = motion if packet_format < 2023 else CarMotionExData2024()
+                for k in range(4):
+                    wheels.wheelSlip[k] = noisy_signal(i, k, 0.15, rng)
+                    wheels.suspensionAcceleration[k] = noisy_signal(i, k + 2, 8000, rng)
+                write(build_header(packet_format, PacketId.Motion, session_time, i) + bytes(motion), capture_time)
+                if packet_format >= 2023:
+                    write(build_header(packet_format, PacketId.MotionEx, session_time, i) + bytes(wheels), capture_time)
+                telemetry = PacketCarTelemetryData()
+                for car in SYNTHETIC_CARS:
+                    telemetry.carTelemetryData[car].engineRPM = int(max(0, 8000 + noisy_signal(i, car, 4000, rng)))
+                write(build_header(packet_format, PacketId.CarTelemetry, session_time, i) + bytes(telemetry), capture_time)
+
+class LiveRuleRecorder:
+    # records input and output of every rule for every record processed by F1Client, as --replay --speed 0 does
+    def __init__(self, path, car):
+        self.client = f1_client.F1Client()
+        self.client.client = ReplaySource(path, 0)
+        self.client.init_processing(cars=(car,))
+        self.client.set_event_callback(lambda events: None)
+        # per rule lists of inputs and outputs, output is negative when rule is not triggered
+        self.inputs = dict()
+        self.outputs = dict()
+        self.suppressed = dict()
+        process_record = self.client.process_record
+        def recording_process_record(producer, engine, data, offset, session_time):
+            suppressed_transitions = producer.filters.suppressed_transitions if producer.filters != None else 0
+            events = process_record(producer, engine, data, offset, session_time)
+            if isinstance(producer, RuleProducer):
+                self.record(producer, engine, suppressed_transitions)
+            return events
+        self.client.process_record = recording_process_record
+
+    def record(self, producer, engine, suppressed_transitions):
+        for i, rule in enumerate(producer.rules):
+            value = engine.values[engine.compiled_rules[i][0]]
+            if rule.input == RuleInput.Negative:
+                value = -value
+            elif rule.input == RuleInput.Absolute:
+                value = abs(value)
+            self.inputs.setdefault(id(rule), list()).append(value)
+            self.outputs.setdefault(id(rule), list()).append(engine.outputs[i])
+        if producer.filters != None:
+            self.suppressed[producer.source] = self.suppressed.get(producer.source, 0) + producer.filters.suppressed_transitions - suppressed_transitions
+
+    def run(self):
+        try:
+            while True:
+                self.client.process()
+        except EOFError:
+            pass
+
+def compare(results, recorder):
+    # returns list of mismatch descriptions, empty when offline analysis equals live processing
+    mismatches = list()
+    offline_suppressed = dict()
+    for result in results:
+        rule = result.rule
+        name = f1_analysis.get_rule_name(rule)
+        offline_suppressed[rule.source] = offline_suppressed.get(rule.source, 0) + result.suppressed
+        outputs = np.array(recorder.outputs.get(id(rule), list()), np.float64)
+        is_active = outputs >= 0
+        was_active = np.concatenate(([False], is_active[:-1]))
+        live = (len(outputs), int(np.count_nonzero(is_active)), int(np.count_nonzero(is_active & ~was_active)), int(np.count_nonzero(was_active & ~is_active)))
+        offline = (result.frames, result.active_frames, result.starts, result.stops)
+        if live != offline:
+            mismatches.append("%s: frames, active frames, starts, stops live %s offline %s" % (name, live, offline))
+            continue
+        if len(outputs) == 0:
+            continue
+        inputs = np.percentile(np.array(recorder.inputs[id(rule)], np.float64), f1_analysis.PERCENTILES)
+        if not np.allclose(inputs, result.input_percentiles, atol=OUTPUT_TOLERANCE):
+            mismatches.append("%s: input percentiles live %s offline %s" % (name, inputs, result.input_percentiles))
+        if live[1] > 0:
+            active_outputs = np.percentile(outputs[is_active], f1_analysis.PERCENTILES)
+            if not np.allclose(active_outputs, result.output_percentiles, atol=OUTPUT_TOLERANCE):
+                mismatches.append("%s: output percentiles live %s offline %s" % (name, active_outputs, result.output_percentiles))
+    # live filters count suppressed transitions per record, not per rule
+    for source, suppressed in recorder.suppressed.items():
+        if suppressed != offline_suppressed.get(source, 0):
+            mismatches.append("%s: suppressed transitions live %d offline %d" % (source, suppressed, offline_suppressed.get(source, 0)))
+    return mismatches
+
+def parse_car(value):
+    if value == "player":
+        return f1_client.PLAYER_CAR
+    if value == "secondary":
+        return f1_client.SECONDARY_PLAYER_CAR
+    return int(value)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check that offline rule analysis (--analyze) gives the same results as live processing of every packet")
+    parser.add_argument("--capture", metavar="PATH", help="capture file to check, synthetic session is generated by default")
+    parser.add_argument("--frames", type=int, default=5000, help="frames of each format in synthetic session")
+    parser.add_argument("--car", type=parse_car, action="append", metavar="CAR", help="checked car: player, secondary or car index, repeat to check several, all synthetic cars by default")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    path = args.capture
+    if path == None:
+        file, path = tempfile.mkstemp(".f1cap")
+        os.close(file)
+        write_synthetic_capture(path, args.frames)
+    cars = args.car if args.car != None else [f1_client.PLAYER_CAR, f1_client.SECONDARY_PLAYER_CAR, SYNTHETIC_CARS[-1]]
+    is_same = True
+    try:
+        for car in cars:
+            results = f1_analysis.analyze_capture(path, car=car)
+            recorder = LiveRuleRecorder(path, car)
+            recorder.run()
+            mismatches = compare(results, recorder)
+            print("Car %d: %d rules, %s" % (car, len(results), "same as live" if len(mismatches) == 0 else "%d mismatches" % len(mismatches)))
+            for mismatch in mismatches:
+                print("  " + mismatch)
+            is_same = is_same and len(mismatches) == 0
+    finally:
+        if args.capture == None:
+            os.remove(path)
+    sys.exit(0 if is_same else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# Stand-in for Teslasuit Python API used by benchmarks, records haptic calls instead of driving a device
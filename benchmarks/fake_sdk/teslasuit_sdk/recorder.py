@@ -0,0 +1,16 @@
+import time
+
+# Recorded haptic calls as (perf_counter time, call name, tag), tag is set by benchmark before dispatching events
+calls = list()
+tag = None
+call_delay_s = float(0)
+
+def record(name):
+    calls.append((time.perf_counter(), name, tag))
+    if call_delay_s > 0:
+        time.sleep(call_delay_s)
+
+def reset():
+    global tag
+    calls.clear()
+    tag = None
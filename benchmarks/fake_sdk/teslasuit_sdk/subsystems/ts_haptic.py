@@ -0,0 +1,24 @@
+from teslasuit_sdk import recorder
+
+class TsHapticPlayer:
+    def __init__(self):
+        self.playables_count = 0
+
+    def create_playable(self, asset_handle, is_looped):
+        self.playables_count += 1
+        return self.playables_count
+
+    def remove_playable(self, playable_id):
+        pass
+
+    def create_touch_multipliers(self, frequency, amplitude, pulse_width):
+        return (frequency, amplitude, pulse_width)
+
+    def set_playable_multipliers(self, playable_id, multipliers):
+        recorder.record("set_playable_multipliers")
+
+    def play_playable(self, playable_id):
+        recorder.record("play_playable")
+
+    def stop_playable(self, playable_id):
+        recorder.record("stop_playable")
@@ -0,0 +1,32 @@
+from teslasuit_sdk.subsystems import ts_haptic
+from teslasuit_sdk.ts_mapper import TsMapper
+
+class TsAssetManager:
+    def load_asset_from_path(self, path):
+        return path
+
+    def unload_asset(self, asset_handle):
+        pass
+
+class TsDevice:
+    def __init__(self):
+        self.haptic = ts_haptic.TsHapticPlayer()
+
+    def get_mapping(self):
+        return None
+
+class TsDeviceManager:
+    def __init__(self):
+        self.device = TsDevice()
+
+    def get_or_wait_last_device_attached(self):
+        return self.device
+
+class TsApi:
+    def __init__(self, lib_path=None):
+        self.asset_manager = TsAssetManager()
+        self.mapper = TsMapper()
+        self.device_manager = TsDeviceManager()
+
+    def get_device_manager(self):
+        return self.device_manager
@@ -0,0 +1,14 @@
+from enum import IntEnum
+
+class TsBone2dIndex(IntEnum):
+    RightUpperArm = 0
+
+class TsMapper:
+    def get_haptic_electric_channel_layout(self, mapping):
+        return None
+
+    def get_layout_bones(self, layout):
+        return dict()
+
+    def get_bone_contents(self, bone):
+        return list()
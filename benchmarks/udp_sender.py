@@ -0,0 +1,91 @@
+import os
+import sys
+import math
+import time
+import socket
+import struct
+import argparse
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from f1_client import PORT
+from f1_packets import PacketHeader, PacketId, PacketMotionData, PacketCarTelemetryData
+
+FRAME_IDENTIFIER = struct.Struct("<I")
+CYCLE_FRAMES = 120
+
+def build_header(packet_id, player_car_index):
+    header = PacketHeader()
+    header.packetFormat = 2021
+    header.packetVersion = 1
+    header.packetId = packet_id
+    header.sessionUID = 1
+    header.playerCarIndex = player_car_index
+    return header
+
+def build_motion_packet(phase, player_car_index=0):
+    # g-forces and wheel values follow a sine wave, so events start, change and stop over a cycle
+    motion_data = PacketMotionData()
+    car_motion_data = motion_data.carMotionData[player_car_index]
+    car_motion_data.gForceLongitudinal = 2 * math.sin(phase)
+    car_motion_data.gForceLateral = 3 * math.cos(phase)
+    for i in range(4):
+        motion_data.wheelSlip[i] = 0.3 * math.sin(phase + i)
+        motion_data.suspensionAcceleration[i] = 20000 * math.sin(2 * phase + i)
+    return bytes(build_header(PacketId.Motion, player_car_index)) + bytes(motion_data)
+
+def build_telemetry_packet(phase, player_car_index=0):
+    telemetry_data = PacketCarTelemetryData()
+    telemetry_data.carTelemetryData[player_car_index].engineRPM = int(8000 + 3000 * math.sin(phase))
+    return bytes(build_header(PacketId.CarTelemetry, player_car_index)) + bytes(telemetry_data)
+
+class SyntheticSender:
+    # sends motion and telemetry packet pairs at given rate, frame identifier is a global packet number
+    def __init__(self, rate, duration_s, address=("127.0.0.1", PORT)):
+        self.rate = rate
+        self.duration_s = duration_s
+        self.address = address
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        packets = list()
+        for i in range(CYCLE_FRAMES):
+            phase = 2 * math.pi * i / CYCLE_FRAMES
+            packets.append(bytearray(build_motion_packet(phase)))
+            packets.append(bytearray(build_telemetry_packet(phase)))
+        self.packets = packets
+        self.send_times = list()
+
+    def run(self):
+        start_time = time.perf_counter()
+        frames_count = int(self.rate * self.duration_s)
+        for frame in range(frames_count):
+            target_time = start_time + frame / self.rate
+            delay = target_time - time.perf_counter()
+            if delay > 0.0005:
+                time.sleep(delay)
+            for packet in self.packets[(frame % CYCLE_FRAMES) * 2:(frame % CYCLE_FRAMES) * 2 + 2]:
+                index = len(self.send_times)
+                FRAME_IDENTIFIER.pack_into(packet, PacketHeader.frameIdentifier.offset, index)
+                struct.pack_into("<f", packet, PacketHeader.sessionTime.offset, frame / self.rate)
+                self.send_times.append(time.perf_counter())
+                self.socket.sendto(packet, self.address)
+
+    def start(self):
+        self.thread = threading.Thread(None, self.run, "SyntheticSender")
+        self.thread.start()
+
+    def join(self):
+        self.thread.join()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Send synthetic F1 2021 motion and telemetry packets")
+    parser.add_argument("--rate", type=float, default=60, help="motion and telemetry packet pairs per second")
+    parser.add_argument("--duration", type=float, default=10, help="duration in seconds")
+    parser.add_argument("--port", type=int, default=PORT)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    sender = SyntheticSender(args.rate, args.duration, ("127.0.0.1", args.port))
+    sender.run()
+    print("Sent packets:", len(sender.send_times))
@@ -0,0 +1,277 @@
+from ctypes import Array, Structure, sizeof
+from collections import namedtuple
+
+import numpy as np
+
+from f1_capture import CAPTURE_MAGIC, RECORD_HEADER
+from f1_packets import CARS_COUNT, PACKET_HEADERS, PACKET_LAYOUTS
+from f1_client import FEEDBACK_RULES, PLAYER_CAR, SECONDARY_PLAYER_CAR
+from ff_event import FeedbackEventDirection, FeedbackEventLocation
+from ff_filter import Smoothing
+from ff_rules import RuleInput
+
+# EMA of a block of frames is computed by one matrix product, only carries between blocks are sequential
+EMA_BLOCK_SIZE = 64
+HISTOGRAM_BINS = 10
+PERCENTILES = (50, 90, 99)
+
+# Offline statistics of one rule over all frames of its source record:
+# frames        - evaluated packets, active_frames - packets rule produced event for
+# starts, stops - event on and off transitions, suppressed - raw threshold crossings filter did not pass
+# input_percentiles  - PERCENTILES of rule input after sign handling and before smoothing
+# output_percentiles - PERCENTILES of event intensity or frequency in active frames, saturated - share of them at 1
+# histogram     - counts of active frame outputs in HISTOGRAM_BINS bins over 0..1
+RuleAnalysis = namedtuple("RuleAnalysis", ["rule", "frames", "active_frames", "starts", "stops", "suppressed", "input_percentiles", "output_percentiles", "saturated", "histogram"])
+
+def structure_dtype(structure):
+    # structured dtype with the same field offsets and size as packed ctypes structure
+    names = list()
+    formats = list()
+    offsets = list()
+    for name, field_type in structure._fields_:
+        names.append(name)
+        formats.append(field_dtype(field_type))
+        offsets.append(getattr(structure, name).offset)
+    return np.dtype({"names": names, "formats": formats, "offsets": offsets, "itemsize": sizeof(structure)})
+
+def field_dtype(field_type):
+    if issubclass(field_type, Array):
+        return np.dtype((field_dtype(field_type._type_), (field_type._length_,)))
+    if issubclass(field_type, Structure):
+        return structure_dtype(field_type)
+    # packets are little endian
+    return np.dtype(field_type).newbyteorder("<")
+
+HEADER_DTYPES = dict((packet_format, structure_dtype(header_type)) for packet_format, header_type in PACKET_HEADERS.items())
+
+def read_capture_index(data):
+    # returns offsets and sizes of datagrams in memory mapped capture, records have variable size so only their headers are walked
+    if bytes(data[:len(CAPTURE_MAGIC)]) != CAPTURE_MAGIC:
+        raise ValueError("Not a capture file")
+    offsets = list()
+    sizes = list()
+    position = len(CAPTURE_MAGIC)
+    end = len(data) - RECORD_HEADER.size
+    unpack_from = RECORD_HEADER.unpack_from
+    while position <= end:
+        arrival_time, size = unpack_from(data, position)
+        position += RECORD_HEADER.size
+        # the last record of interrupted capture may be incomplete
+        if position + size > len(data):
+            break
+        offsets.append(position)
+        sizes.append(size)
+        position += size
+    return np.array(offsets, np.int64), np.array(sizes, np.int64)
+
+def gather(data, offsets, dtype):
+    # copies values of dtype at arbitrary offsets of data into contiguous array
+    index = offsets[:, None] + np.arange(dtype.itemsize)
+    return data[index].view(dtype)[:, 0]
+
+def gather_field(data, offsets, record_dtype, field, index=None):
+    dtype, offset = record_dtype.fields[field][:2]
+    if index != None:
+        dtype = dtype.base
+        offset += index * dtype.itemsize
+    return gather(data, offsets + offset, dtype)
+
+def get_car_indices(data, offsets, header_dtype, car):
+    # car index of binding in each packet, see EventTarget.get_car_index
+    if car == PLAYER_CAR:
+        return gather_field(data, offsets, header_dtype, "playerCarIndex").astype(np.int64)
+    if car == SECONDARY_PLAYER_CAR:
+        return gather_field(data, offsets, header_dtype, "secondaryPlayerCarIndex").astype(np.int64)
+    return np.full(len(offsets), car, np.int64)
+
+def read_sources(data, offsets, sizes, rules, car=PLAYER_CAR):
+    # returns session times and rule input values of every source record in file order, values are read only for fields used by rules
+    packet_formats = gather_field(data, offsets, HEADER_DTYPES[min(HEADER_DTYPES)], "packetFormat")
+    parts = dict()
+    for packet_format, header_type in PACKET_HEADERS.items():
+        selected = np.flatnonzero(packet_formats == packet_format)
+        if len(selected) == 0:
+            continue
+        header_dtype = HEADER_DTYPES[packet_format]
+        header_offsets = offsets[selected]
+        packet_ids = gather_field(data, header_offsets, header_dtype, "packetId")
+        packet_versions = gather_field(data, header_offsets, header_dtype, "packetVersion")
+        for (layout_format, packet_id, packet_version), records in PACKET_LAYOUTS.items():
+            if layout_format != packet_format:
+                continue
+            in_layout = np.flatnonzero((packet_ids == packet_id) & (packet_versions == packet_version))
+            for source, record in records.items():
+                source_rules = [rule for rule in rules if rule.source == source]
+                if len(source_rules) == 0 or len(in_layout) == 0 or (record.is_player_only and car != PLAYER_CAR):
+                    continue
+                packets = selected[in_layout]
+                packet_offsets = offsets[packets]
+                car_indices = get_car_indices(data, packet_offsets, header_dtype, car)
+                record_offsets = packet_offsets + sizeof(header_type) + record.offset + car_indices * record.car_stride
+                # the same checks as live decoding, car must be in session and record must be in packet
+                is_valid = (car_indices >= 0) & (car_indices < CARS_COUNT) & (record_offsets + sizeof(record.structure) <= packet_offsets + sizes[packets])
+                packets = packets[is_valid]
+                record_offsets = record_offsets[is_valid]
+                record_dtype = structure_dtype(record.structure)
+                times = gather_field(data, packet_offsets[is_valid], header_dtype, "sessionTime").astype(np.float64)
+                values = [gather_field(data, record_offsets, record_dtype, rule.field, rule.index).astype(np.float64) for rule in source_rules]
+                parts.setdefault(source, list()).append((packets, times, values))
+    # packets of a source may come in several layouts, they are merged back into file order
+    sources = dict()
+    for source, source_parts in parts.items():
+        order = np.argsort(np.concatenate([packets for packets, times, values in source_parts]), kind="stable")
+        times = np.concatenate([times for packets, times, values in source_parts])[order]
+        values = [np.concatenate(rule_values)[order] for rule_values in zip(*[values for packets, times, values in source_parts])]
+        sources[source] = (times, values)
+    return sources
+
+def get_segments(times):
+    # filters are reset when session time goes back, e.g. new session or flashback
+    bounds = np.flatnonzero(np.diff(times) < 0) + 1
+    return zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(times)])))
+
+def moving_average(values, window):
+    # average of the last window values, fewer at the start as in filter ring buffer
+    sums = np.cumsum(values)
+    sums[window:] = sums[window:] - sums[:-window]
+    return sums / np.minimum(np.arange(1, len(values) + 1), window)
+
+def ema(values, alpha):
+    # y[0] = x[0], y[i] = y[i - 1] + alpha * (x[i] - y[i - 1])
+    count = len(values)
+    if count == 0:
+        return values.copy()
+    decay = 1 - alpha
+    blocks = -(-count // EMA_BLOCK_SIZE)
+    padded = np.zeros(blocks * EMA_BLOCK_SIZE)
+    padded[:count] = values
+    steps = np.arange(EMA_BLOCK_SIZE)
+    lags = steps[:, None] - steps[None, :]
+    weights = np.where(lags >= 0, alpha * decay ** np.maximum(lags, 0), float(0))
+    carry_weights = decay ** (steps + 1)
+    filtered = padded.reshape(blocks, EMA_BLOCK_SIZE) @ weights.T
+    carry = values[0]
+    for block in filtered:
+        block += carry_weights * carry
+        carry = block[-1]
+    return filtered.reshape(-1)[:count]
+
+def find_transition(times, frames, start, change_time, hold_s):
+    # first frame from start listed in frames with hold time passed since change_time, len(times) if none
+    first = np.searchsorted(times, change_time + hold_s)
+    # session time is compared as in SignalFilter, rounding of sum may move the first allowed frame by one
+    while first > 0 and times[first - 1] - change_time >= hold_s:
+        first -= 1
+    while first < len(times) and times[first] - change_time < hold_s:
+        first += 1
+    position = np.searchsorted(frames, max(start, first))
+    return frames[position] if position < len(frames) else len(times)
+
+def hysteresis(values, times, on_threshold, off_threshold, min_on_s, min_off_s):
+    # state of SignalFilter in every frame of one segment, loop runs once per transition instead of once per frame
+    count = len(values)
+    is_active = np.zeros(count, bool)
+    on_frames = np.flatnonzero(values > on_threshold)
+    off_frames = np.flatnonzero(values < off_threshold)
+    change_time = float("-inf")
+    position = 0
+    while position < count:
+        on_frame = find_transition(times, on_frames, position, change_time, min_off_s)
+        if on_frame >= count:
+            break
+        off_frame = find_transition(times, off_frames, on_frame + 1, times[on_frame], min_on_s)
+        is_active[on_frame:off_frame] = True
+        if off_frame >= count:
+            break
+        change_time = times[off_frame]
+        position = off_frame + 1
+    return is_active
+
+def evaluate_filter(values, times, rule):
+    # returns smoothed values, active frames and count of suppressed transitions as SignalFilter of the rule
+    spec = rule.filter
+    window = max(spec.window, 1)
+    on_threshold = rule.threshold if rule.threshold != None else float("-inf")
+    off_threshold = spec.off_threshold if spec.off_threshold != None else on_threshold
+    smoothed = np.empty_like(values)
+    is_active = np.zeros(len(values), bool)
+    suppressed = 0
+    for start, end in get_segments(times):
+        segment = values[start:end]
+        if spec.smoothing == Smoothing.MovingAverage:
+            segment = moving_average(segment, window)
+        elif spec.smoothing == Smoothing.Ema:
+            segment = ema(segment, 2 / (window + 1))
+        smoothed[start:end] = segment
+        segment_active = hysteresis(segment, times[start:end], on_threshold, off_threshold, spec.min_on_s, spec.min_off_s)
+        is_active[start:end] = segment_active
+        # raw crossings are counted only when event state did not change in the same frame
+        is_raw_active = values[start:end] > on_threshold
+        raw_changes = is_raw_active != np.concatenate(([False], is_raw_active[:-1]))
+        state_changes = segment_active != np.concatenate(([False], segment_active[:-1]))
+        suppressed += int(np.count_nonzero(raw_changes & ~state_changes))
+    return smoothed, is_active, suppressed
+
+def evaluate_rule(rule, values, times):
+    # vectorized RuleEngine.evaluate over all frames, returns RuleAnalysis
+    if rule.input == RuleInput.Negative:
+        values = -values
+    elif rule.input == RuleInput.Absolute:
+        values = np.abs(values)
+    if rule.filter != None:
+        outputs, is_active, suppressed = evaluate_filter(values, times, rule)
+    else:
+        outputs = values
+        is_active = values > (rule.threshold if rule.threshold != None else float("-inf"))
+        suppressed = 0
+    outputs = outputs[is_active]
+    if rule.range_min != None:
+        outputs = np.clip((outputs - rule.range_min) / (rule.range_max - rule.range_min), float(0), float(1))
+    if rule.curve != None:
+        outputs = rule.curve(outputs)
+    was_active = np.concatenate(([False], is_active[:-1]))
+    active_frames = len(outputs)
+    return RuleAnalysis(rule, len(values), active_frames,
+                        int(np.count_nonzero(is_active & ~was_active)), int(np.count_nonzero(was_active & ~is_active)), suppressed,
+                        np.percentile(values, PERCENTILES) if len(values) > 0 else None,
+                        np.percentile(outputs, PERCENTILES) if active_frames > 0 else None,
+                        np.count_nonzero(outputs >= 1) / active_frames if active_frames > 0 else float(0),
+                        np.histogram(outputs, HISTOGRAM_BINS, (float(0), float(1)))[0])
+
+def analyze_capture(path, rules=FEEDBACK_RULES, car=PLAYER_CAR):
+    # evaluates rules over all packets of capture file in one pass per rule, returns RuleAnalysis of every rule
+    data = np.memmap(path, np.uint8, "r")
+    offsets, sizes = read_capture_index(data)
+    sources = read_sources(data, offsets, sizes, rules, car)
+    results = list()
+    rule_positions = dict()
+    for rule in rules:
+        position = rule_positions.get(rule.source, 0)
+        rule_positions[rule.source] = position + 1
+        if rule.source not in sources:
+            results.append(RuleAnalysis(rule, 0, 0, 0, 0, 0, None, None, float(0), np.zeros(HISTOGRAM_BINS, np.int64)))
+            continue
+        times, values = sources[rule.source]
+        results.append(evaluate_rule(rule, values[position], times))
+    return results
+
+def get_rule_name(rule):
+    name = rule.type.name
+    if rule.direction != FeedbackEventDirection.Undefined:
+        name += " " + rule.direction.name
+    if rule.location != FeedbackEventLocation.Undefined:
+        name += " " + rule.location.name
+    return name
+
+def format_percentiles(percentiles):
+    if percentiles is None:
+        return "-"
+    return " ".join("%.3g" % value for value in percentiles)
+
+def print_analysis(results):
+    print("%-26s %8s %7s %6s %6s %6s  %-26s %-18s %5s  %s" % ("rule", "frames", "active", "starts", "stops", "suppr", "input p50 p90 p99", "output p50 p90 p99", "sat", "output histogram 0..1"))
+    for result in results:
+        active_percent = 100 * result.active_frames / result.frames if result.frames > 0 else float(0)
+        print("%-26s %8d %6.1f%% %6d %6d %6d  %-26s %-18s %4.0f%%  %s" % (get_rule_name(result.rule), result.frames, active_percent, result.starts, result.stops, result.suppressed,
+                                                                        format_percentiles(result.input_percentiles), format_percentiles(result.output_percentiles), 100 * result.saturated,
+                                                                        " ".join(str(count) for count in result.histogram)))
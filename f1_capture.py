@@ -0,0 +1,68 @@
+import time
+import struct
+
+# Capture file is a magic string followed by records:
+# arrival time in seconds since capture start (double), datagram size (uint16), raw datagram bytes
+CAPTURE_MAGIC = b"F1UDPCAP"
+RECORD_HEADER = struct.Struct("<dH")
+
+class CaptureWriter:
+    # appends raw datagrams with arrival timestamps to capture file
+    def __init__(self, path):
+        self.file = open(path, "wb")
+        self.file.write(CAPTURE_MAGIC)
+        self.start_time = time.perf_counter()
+        self.packets_count = 0
+
+    def write(self, data, size):
+        self.file.write(RECORD_HEADER.pack(time.perf_counter() - self.start_time, size))
+        self.file.write(memoryview(data)[:size])
+        self.packets_count += 1
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+            print("Captured packets:", self.packets_count)
+
+class ReplaySource:
+    # socket-like packet source reading capture file, speed 0 replays as fast as possible
+    def __init__(self, path, speed=1.0):
+        self.file = open(path, "rb")
+        if self.file.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            raise ValueError("Not a capture file: " + path)
+        self.speed = speed
+        self.is_blocking = True
+        self.start_time = None
+        self.record_header = bytearray(RECORD_HEADER.size)
+        self.next_record = None
+        self.packets_count = 0
+
+    def setblocking(self, flag):
+        self.is_blocking = flag
+
+    def recv_into(self, buffer):
+        # raises EOFError at the end of capture, BlockingIOError in non blocking mode when next packet is not due yet
+        arrival_time, size = self.__peek_record()
+        if self.speed > 0:
+            if self.start_time == None:
+                self.start_time = time.perf_counter() - arrival_time / self.speed
+            delay = self.start_time + arrival_time / self.speed - time.perf_counter()
+            if delay > 0:
+                if not self.is_blocking:
+                    raise BlockingIOError()
+                time.sleep(delay)
+        if self.file.readinto(memoryview(buffer)[:size]) != size:
+            raise EOFError()
+        self.next_record = None
+        self.packets_count += 1
+        return size
+
+    def __peek_record(self):
+        if self.next_record == None:
+            if self.file.readinto(self.record_header) != RECORD_HEADER.size:
+                raise EOFError()
+            self.next_record = RECORD_HEADER.unpack(self.record_header)
+        return self.next_record
+
+    def close(self):
+        self.file.close()
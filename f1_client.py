@@ -1,12 +1,16 @@
 import time
 import socket
 import threading
-from struct import *
 from ctypes import *
-from enum import IntEnum, unique
-from collections import namedtuple
 
+from haptic_worker import HapticWorker
+from haptic_scheduler import HapticScheduler
 from ff_event import FeedbackEvent, FeedbackEventType, FeedbackEventDirection, FeedbackEventLocation
+from ff_rules import FeedbackRule, RuleInput, RuleOutput, normalize, normalize_period_percent
+from ff_filter import SignalFilterSpec, Smoothing
+from f1_decoders import DecoderRegistry, STOP_EVENTS_DELAY_S
+from f1_producers import RaceEventProducer, DamageProducer
+from f1_packets import *
 
 PORT = 20777
 MAX_PACKET_SIZE = 65535
@@ -14,277 +18,422 @@ MAX_PACKET_SIZE = 65535
 GFORCE_THRESHOLD_N = 0.2
 WHEEL_SLIP_THRESHOLD_N = 0.1
 SUSPENSION_ACCELERATION_THRESHOLD_ACC = 6000
-STOP_EVENTS_DELAY_S = 0.2
+# Events are disabled below lower thresholds and stay enabled for minimal time, so signals near threshold do not flip events every packet
+GFORCE_OFF_THRESHOLD_N = 0.15
+WHEEL_SLIP_OFF_THRESHOLD_N = 0.07
+SUSPENSION_ACCELERATION_OFF_THRESHOLD_ACC = 4500
+EVENT_MIN_ON_S = 0.1
+DROPPED_FRAMES_REPORT_PERIOD_S = 1
 
-class F1Client:
-    def init(self):
-        print("Connecting to F1 game socket...")
-        self.client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-        self.client.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        self.client.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.client.bind(("", PORT))
-
-        self.motion_events = list()
-        self.telemetry_events = list()
-        self.prev_motion_events = list()        
-        self.prev_telemetry_events = list()
+def rpm_period_curve(rpm_percent):
+    return normalize_period_percent(rpm_percent, float(6666), float(16666))
+
+GFORCE_FILTER = SignalFilterSpec(Smoothing.Ema, 3, GFORCE_OFF_THRESHOLD_N, EVENT_MIN_ON_S)
+WHEEL_SLIP_FILTER = SignalFilterSpec(Smoothing.Ema, 3, WHEEL_SLIP_OFF_THRESHOLD_N, EVENT_MIN_ON_S)
+SUSPENSION_ACCELERATION_FILTER = SignalFilterSpec(Smoothing.MovingAverage, 4, SUSPENSION_ACCELERATION_OFF_THRESHOLD_ACC, EVENT_MIN_ON_S)
+
+# Wheel arrays order is RL, RR, FL, FR
+MOTION_RULES = [
+    # acceleration and breaking
+    FeedbackRule("car_motion", "gForceLongitudinal", None, RuleInput.Positive, GFORCE_THRESHOLD_N, float(0), float(1.8), FeedbackEventType.GForce, direction=FeedbackEventDirection.Back, filter=GFORCE_FILTER),
+    FeedbackRule("car_motion", "gForceLongitudinal", None, RuleInput.Negative, GFORCE_THRESHOLD_N, float(0), float(4), FeedbackEventType.GForce, direction=FeedbackEventDirection.Front, filter=GFORCE_FILTER),
+    # side g-forces
+    FeedbackRule("car_motion", "gForceLateral", None, RuleInput.Positive, GFORCE_THRESHOLD_N, float(0), float(3.5), FeedbackEventType.GForce, direction=FeedbackEventDirection.Right, filter=GFORCE_FILTER),
+    FeedbackRule("car_motion", "gForceLateral", None, RuleInput.Negative, GFORCE_THRESHOLD_N, float(0), float(3.5), FeedbackEventType.GForce, direction=FeedbackEventDirection.Left, filter=GFORCE_FILTER),
+    # wheel slip
+    FeedbackRule("motion_ex", "wheelSlip", 0, RuleInput.Absolute, WHEEL_SLIP_THRESHOLD_N, None, None, FeedbackEventType.Slip, location=FeedbackEventLocation.RearLeftDown, filter=WHEEL_SLIP_FILTER),
+    FeedbackRule("motion_ex", "wheelSlip", 1, RuleInput.Absolute, WHEEL_SLIP_THRESHOLD_N, None, None, FeedbackEventType.Slip, location=FeedbackEventLocation.RearRightDown, filter=WHEEL_SLIP_FILTER),
+    FeedbackRule("motion_ex", "wheelSlip", 2, RuleInput.Absolute, WHEEL_SLIP_THRESHOLD_N, None, None, FeedbackEventType.Slip, location=FeedbackEventLocation.FrontLeftDown, filter=WHEEL_SLIP_FILTER),
+    FeedbackRule("motion_ex", "wheelSlip", 3, RuleInput.Absolute, WHEEL_SLIP_THRESHOLD_N, None, None, FeedbackEventType.Slip, location=FeedbackEventLocation.FrontRightDown, filter=WHEEL_SLIP_FILTER),
+    # suspension shaking
+    FeedbackRule("motion_ex", "suspensionAcceleration", 0, RuleInput.Absolute, SUSPENSION_ACCELERATION_THRESHOLD_ACC, float(6000), float(100000), FeedbackEventType.Shaking, location=FeedbackEventLocation.RearLeftDown, filter=SUSPENSION_ACCELERATION_FILTER),
+    FeedbackRule("motion_ex", "suspensionAcceleration", 1, RuleInput.Absolute, SUSPENSION_ACCELERATION_THRESHOLD_ACC, float(6000), float(100000), FeedbackEventType.Shaking, location=FeedbackEventLocation.RearRightDown, filter=SUSPENSION_ACCELERATION_FILTER),
+    FeedbackRule("motion_ex", "suspensionAcceleration", 2, RuleInput.Absolute, SUSPENSION_ACCELERATION_THRESHOLD_ACC, float(6000), float(100000), FeedbackEventType.Shaking, location=FeedbackEventLocation.FrontLeftDown, filter=SUSPENSION_ACCELERATION_FILTER),
+    FeedbackRule("motion_ex", "suspensionAcceleration", 3, RuleInput.Absolute, SUSPENSION_ACCELERATION_THRESHOLD_ACC, float(6000), float(100000), FeedbackEventType.Shaking, location=FeedbackEventLocation.FrontRightDown, filter=SUSPENSION_ACCELERATION_FILTER),
+]
+
+TELEMETRY_RULES = [
+    # engine vibration, frequency follows rpm
+    FeedbackRule("car_telemetry", "engineRPM", None, RuleInput.Positive, None, float(4400), float(11000), FeedbackEventType.Vibration, output=RuleOutput.Frequency, curve=rpm_period_curve),
+]
+
+FEEDBACK_RULES = MOTION_RULES + TELEMETRY_RULES
+
+PACKET_COUNTER_NAMES = ["packets." + packet_id.name for packet_id in PacketId]
+
+# Car bindings resolved from packet header, other bindings are fixed car indices
+PLAYER_CAR = -1
+SECONDARY_PLAYER_CAR = -2
+
+class EventTarget:
+    # events of one car dispatched to one device, producers are per target so event state of different cars never mix
+    # event_types - event types consumed by target callback, None for all
+    def __init__(self, car=PLAYER_CAR, stats=None, event_types=None):
+        self.car = car
+        self.stats = stats
+        # player only records are decoded only for player car
+        self.decoders = DecoderRegistry(is_player=car == PLAYER_CAR)
+        self.decoders.subscribe_rules(FEEDBACK_RULES)
+        # packets of pulse producers are not decoded when nobody consumes their events
+        for producer in (RaceEventProducer(), DamageProducer()):
+            if event_types == None or any(type in event_types for type in producer.event_types):
+                self.decoders.subscribe(producer)
+        self.producers = self.decoders.producers
+        self.timed_producers = [producer for producer in self.producers if producer.is_timed]
         self.event_callback = None
+        self.haptic_worker = None
+        self.haptic_scheduler = None
+
+    def get_car_index(self, header):
+        # index of bound car in packet, values out of cars range mean the car is not in session
+        if self.car == PLAYER_CAR:
+            return header.playerCarIndex
+        if self.car == SECONDARY_PLAYER_CAR:
+            return header.secondaryPlayerCarIndex
+        return self.car
+
+    def dispatch(self, events):
+        if self.event_callback != None:
+            if self.stats != None:
+                start_time = time.perf_counter()
+                self.event_callback(events)
+                self.stats.record("dispatch", time.perf_counter() - start_time)
+            else:
+                self.event_callback(events)
+
+    def stop(self):
+        if self.haptic_worker != None:
+            self.haptic_worker.stop()
+        if self.haptic_scheduler != None:
+            self.haptic_scheduler.stop()
+
+class F1Client:
+    def init(self, use_haptic_worker=False, source=None, capture_writer=None, stats=None, tick_rate_hz=None, cars=(PLAYER_CAR,), relay=None, use_session_clock=False, event_types=None):
+        # source - socket-like object with recv_into and setblocking, e.g. replay of captured session, game socket is used by default
+        # cars - car binding of each event target, packets are received and parsed once for all of them
+        # event_types - event types consumed by clients, producers of other types are not subscribed, None for all
+        # use_session_clock - stale events are stopped by game session time of packets instead of wall clock, for replay faster than real time
+        if source == None:
+            print("Connecting to F1 game socket...")
+            self.client = create_game_socket()
+        else:
+            self.client = source
+        self.init_processing(capture_writer, stats, cars, relay, use_session_clock, event_types)
+        # dispatch events on a separate thread per target so slow SDK calls never block the socket and devices never wait for each other
+        # with tick rate events are dispatched at fixed rate with intensity interpolated by game session time
+        for target in self.targets:
+            if tick_rate_hz != None:
+                target.haptic_scheduler = HapticScheduler(target.dispatch, tick_rate_hz, stats)
+            elif use_haptic_worker:
+                target.haptic_worker = HapticWorker(target.dispatch)
 
         self.is_running = True
-        self.last_motion_event_time = time.time()
-        self.last_telemetry_event_time = time.time()
         self.thread = threading.Thread(None, self.__update_state)
         self.thread.start()
-        print("Game socket connected.")
+        if source == None:
+            print("Game socket connected.")
+
+    def init_processing(self, capture_writer=None, stats=None, cars=(PLAYER_CAR,), relay=None, use_session_clock=False, event_types=None):
+        # packet processing state shared by all ways of receiving packets
+        # raw received datagrams are written to capture writer and forwarded by relay if set
+        self.capture_writer = capture_writer
+        self.relay = relay
+        # optional per stage durations and counters
+        self.stats = stats
+        # decoders of subscribed records in all supported packet formats are compiled once at startup for every target
+        self.targets = [EventTarget(car, stats, event_types) for car in cars]
+        self.unsupported_formats = set()
+        self.packet = PacketBuffer()
+        self.free_packets = list()
+        self.dropped_frames = 0
+        self.reported_dropped_frames = 0
+        self.last_dropped_frames_report_time = time.time()
+        # game session time of the last processed packet
+        self.session_time = float(0)
+        self.use_session_clock = use_session_clock
+        # decode duration of the packet being processed, used with stats only
+        self.decode_time = float(0)
 
     def __del__(self):
         self.stop()
 
     def stop(self):
-        self.stop_motion_events()
-        self.stop_telemetry_events()
+        if not getattr(self, "is_running", False):
+            return
         self.is_running = False
         self.thread.join()
+        for target in self.targets:
+            for producer in target.producers:
+                self.stop_events(target, producer.stream)
+            target.stop()
 
     def __update_state(self):
         while self.is_running:
-            if time.time() - self.last_motion_event_time > STOP_EVENTS_DELAY_S:
-                self.stop_events(self.motion_events, self.prev_motion_events)
-            if time.time() - self.last_telemetry_event_time > STOP_EVENTS_DELAY_S:
-                self.stop_events(self.telemetry_events, self.prev_telemetry_events)
+            # with session clock stale events are stopped by packets on receive thread
+            if not self.use_session_clock:
+                for target in self.targets:
+                    for producer in target.producers:
+                        if time.time() - producer.last_event_time > producer.stop_delay_s:
+                            self.stop_stale_events(target, producer.stream)
+            self.report_dropped_frames()
             time.sleep(0.1)
 
-    def set_event_callback(self, callback):
-        self.event_callback = callback
+    def report_dropped_frames(self):
+        if time.time() - self.last_dropped_frames_report_time < DROPPED_FRAMES_REPORT_PERIOD_S:
+            return
+        self.last_dropped_frames_report_time = time.time()
+        dropped_frames = self.dropped_frames - self.reported_dropped_frames
+        self.reported_dropped_frames += dropped_frames
+        if dropped_frames > 0:
+            print("F1 client: dropped stale frames:", dropped_frames)
+
+    def set_event_callback(self, callback, target_index=0):
+        # target_index - index of car binding passed to init
+        self.targets[target_index].event_callback = callback
+
+    def notify(self, target, events):
+        if target.haptic_scheduler != None:
+            target.haptic_scheduler.publish(events, self.session_time)
+        elif target.haptic_worker != None:
+            target.haptic_worker.publish(events)
+        else:
+            target.dispatch(events)
 
     def process(self):
-        # parse packet header
-        self.packet, addr = self.client.recvfrom(MAX_PACKET_SIZE)
-        header = PacketHeader()
-        memmove(addressof(header), self.packet[0:header.get_size()], header.get_size())
-        # collect events and notify
-        if header.packetId == PacketId.Motion:
-            self.process_motion(self.packet, header.get_size(), header.playerCarIndex)
-        if header.packetId == PacketId.CarTelemetry:
-            self.process_telemetry(self.packet, header.get_size(), header.playerCarIndex)
-
-    def process_motion(self, packet, offset, player_car_index):
-        # parse motion data
-        motion_data = PacketMotionData()
-        memmove(addressof(motion_data), packet[offset:motion_data.get_size()], motion_data.get_size())
-        # clear event list
-        self.motion_events = list()
-        # generate events
-
-        # acceleration and breaking
-        g_force_longitudinal = motion_data.carMotionData[player_car_index].gForceLongitudinal       
-        if g_force_longitudinal > GFORCE_THRESHOLD_N:
-            self.motion_events.append(FeedbackEvent(type=FeedbackEventType.GForce, direction=FeedbackEventDirection.Back, intensity_percent=normalize(g_force_longitudinal, float(0), float(1.8))))
-        elif g_force_longitudinal < -GFORCE_THRESHOLD_N:
-            self.motion_events.append(FeedbackEvent(type=FeedbackEventType.GForce, direction=FeedbackEventDirection.Front,  intensity_percent=normalize(-g_force_longitudinal, float(0), float(4))))
-        # side g-forces
-        g_force_lateral = motion_data.carMotionData[player_car_index].gForceLateral    
-        if g_force_lateral > GFORCE_THRESHOLD_N:
-            self.motion_events.append(FeedbackEvent(type=FeedbackEventType.GForce, direction=FeedbackEventDirection.Right, intensity_percent=normalize(g_force_lateral, float(0), float(3.5))))
-        elif g_force_lateral < -GFORCE_THRESHOLD_N:
-            self.motion_events.append(FeedbackEvent(type=FeedbackEventType.GForce, direction=FeedbackEventDirection.Left, intensity_percent=normalize(-g_force_lateral, float(0), float(3.5))))
-        # wheel slip
-        wheel_slip_rl = abs(motion_data.wheelSlip[0])
-        wheel_slip_rr = abs(motion_data.wheelSlip[1])
-        wheel_slip_fl = abs(motion_data.wheelSlip[2])
-        wheel_slip_fr = abs(motion_data.wheelSlip[3])
-        if wheel_slip_rl > WHEEL_SLIP_THRESHOLD_N:
-            self.motion_events.append(FeedbackEvent(type=FeedbackEventType.Slip, location=FeedbackEventLocation.RearLeftDown, intensity_percent=wheel_slip_rl))
-        if wheel_slip_rr > WHEEL_SLIP_THRESHOLD_N:
-            self.motion_events.append(FeedbackEvent(type=FeedbackEventType.Slip, location=FeedbackEventLocation.RearRightDown, intensity_percent=wheel_slip_rr))
-        if wheel_slip_fl > WHEEL_SLIP_THRESHOLD_N:
-            self.motion_events.append(FeedbackEvent(type=FeedbackEventType.Slip, location=FeedbackEventLocation.FrontLeftDown, intensity_percent=wheel_slip_fl))
-        if wheel_slip_fr > WHEEL_SLIP_THRESHOLD_N:
-            self.motion_events.append(FeedbackEvent(type=FeedbackEventType.Slip, location=FeedbackEventLocation.FrontRightDown, intensity_percent=wheel_slip_fr))
-        # suspension shaking
-        s_acc_rl = abs(motion_data.suspensionAcceleration[0])
-        s_acc_rr = abs(motion_data.suspensionAcceleration[1])
-        s_acc_fl = abs(motion_data.suspensionAcceleration[2])
-        s_acc_fr = abs(motion_data.suspensionAcceleration[3])
-        if s_acc_rl > SUSPENSION_ACCELERATION_THRESHOLD_ACC:
-            self.motion_events.append(FeedbackEvent(type=FeedbackEventType.Shaking, location=FeedbackEventLocation.RearLeftDown, intensity_percent=normalize(s_acc_rl, float(6000), float(100000))))
-        if s_acc_rr > SUSPENSION_ACCELERATION_THRESHOLD_ACC:
-            self.motion_events.append(FeedbackEvent(type=FeedbackEventType.Shaking, location=FeedbackEventLocation.RearRightDown, intensity_percent=normalize(s_acc_rl, float(6000), float(100000))))
-        if s_acc_fl > SUSPENSION_ACCELERATION_THRESHOLD_ACC:
-            self.motion_events.append(FeedbackEvent(type=FeedbackEventType.Shaking, location=FeedbackEventLocation.FrontLeftDown, intensity_percent=normalize(s_acc_rl, float(6000), float(100000))))
-        if s_acc_fr > SUSPENSION_ACCELERATION_THRESHOLD_ACC:
-            self.motion_events.append(FeedbackEvent(type=FeedbackEventType.Shaking, location=FeedbackEventLocation.FrontRightDown, intensity_percent=normalize(s_acc_rl, float(6000), float(100000))))
-
-        # look for finished events and disable them
-        self.process_finished_events(self.motion_events, self.prev_motion_events)
-        # store as prev events
-        self.prev_motion_events = self.motion_events.copy()
-        # register event time
-        self.last_motion_event_time = time.time()
-        # notify about events
-        if self.event_callback != None:
-            self.event_callback(self.motion_events)
-
-    def process_telemetry(self, packet, offset, player_car_index):
-        # parse telemetry data
-        telemetry_data = PacketCarTelemetryData()
-        memmove(addressof(telemetry_data), packet[offset:telemetry_data.get_size()], telemetry_data.get_size())
-        # clear event list
-        self.telemetry_events = list()
-        # generate events
-        rpm = telemetry_data.carTelemetryData[player_car_index].engineRPM
-        rpm_percent = normalize(rpm, float(4400), float(11000))
-        f_percent = normalize_period_percent(rpm_percent, float(6666), float(16666))
-        self.telemetry_events.append(FeedbackEvent(type=FeedbackEventType.Vibration, frequency_percent=f_percent))
-        # look for finished events and disable them
-        self.process_finished_events(self.telemetry_events, self.prev_telemetry_events)
-        # store as prev events
-        self.prev_telemetry_events = self.telemetry_events.copy()
-        # register event time
-        self.last_telemetry_event_time = time.time()
-        # notify about events
-        if self.event_callback != None:
-            self.event_callback(self.telemetry_events)
+        # receive packet into preallocated buffer, header view is updated in place
+        packet = self.packet
+        self.__receive(packet)
+        self.process_packet(packet)
+        # relay is served after haptic processing
+        if self.relay != None:
+            self.relay.forward(packet.data, packet.size)
+
+    def process_latest(self):
+        try:
+            return self.__process_latest()
+        finally:
+            # every drained datagram is relayed after kept packets are processed, including stale frames and datagrams before replay end
+            if self.relay != None:
+                self.relay.flush()
+
+    def __process_latest(self):
+        # wait for the first packet, then drain everything pending without blocking
+        pending_packets = dict()
+        self.__receive(self.packet)
+        self.__defer_relay(self.packet)
+        dropped_frames = self.__keep_latest(pending_packets)
+        self.client.setblocking(False)
+        try:
+            while True:
+                self.__receive(self.packet, True)
+                self.__defer_relay(self.packet)
+                dropped_frames += self.__keep_latest(pending_packets)
+        except BlockingIOError:
+            pass
+        finally:
+            self.client.setblocking(True)
+        self.dropped_frames += dropped_frames
+        if self.stats != None and dropped_frames > 0:
+            self.stats.count("dropped_frames", dropped_frames)
+        # generate events only from the newest packet of each type
+        for packet in pending_packets.values():
+            self.process_packet(packet)
+            self.free_packets.append(packet)
+        return dropped_frames
+
+    def __receive(self, packet, is_timed=False):
+        # only non blocking receive is timed, blocking one includes waiting for the game
+        if is_timed and self.stats != None:
+            start_time = time.perf_counter()
+            packet.size = self.client.recv_into(packet.data)
+            self.stats.record("receive", time.perf_counter() - start_time)
         else:
-            print("F1 client: no client subscribed to events")
-
-    def process_finished_events(self, events, prev_events):
-        for prev_event in prev_events:
-            if not prev_event.is_enable:
-                continue
-            continue_event = False
-            for event in events:
-                if event.is_same(prev_event):
-                    continue_event = True
-                    break
-            if not continue_event:
-                events.append(FeedbackEvent(type=prev_event.type, direction=prev_event.direction, location=prev_event.location, is_enable=False))
-
-    def stop_events(self, events, prev_events):
-        if len(prev_events) == 0:
+            packet.size = self.client.recv_into(packet.data)
+        if self.capture_writer != None:
+            self.capture_writer.write(packet.data, packet.size)
+        if self.stats != None:
+            self.count_packet(packet)
+
+    def count_packet(self, packet):
+        # every received datagram is counted by type once, also stale frames and packets nobody subscribed to
+        if packet.size < sizeof(PacketHeader):
             return
-        events.clear()
-        for event in prev_events:
-            if event.is_enable:
-                events.append(FeedbackEvent(type=event.type, direction=event.direction, location=event.location, is_enable=False))
-        prev_events.clear()
-        if self.event_callback != None:
-            self.event_callback(events)
-
-def normalize(value, min, max):
-    if (value > max):
-        return float(1)
-    elif (value < min):
-        return float(0)
-    else:
-        return float(value - min) / float(max - min)
-
-def normalize_period_percent(period_percent, period_min, period_max):
-    target_period = ((float(1) - period_percent) * (period_max - period_min)) + period_min
-    percent = target_period / period_max
-    return percent
-
-#######################################################################################################################
-
-class PacketHeader(Structure):
-    _pack_ = 1
-    _fields_ = [("packetFormat", c_uint16),           # 2021
-                ("gameMajorVersion", c_uint8),        # Game major version - "X.00"
-                ("gameMinorVersion", c_uint8),        # Game minor version - "1.XX"
-                ("packetVersion", c_uint8),           # Version of this packet type, all start from 1
-                ("packetId", c_uint8),                # Identifier for the packet type, see below
-                ("sessionUID", c_uint64),             # Unique identifier for the session
-                ("sessionTime", c_float),             # Session timestamp
-                ("frameIdentifier", c_uint32),        # Identifier for the frame the data was retrieved on
-                ("playerCarIndex", c_uint8),          # Index of player's car in the array
-                ("secondaryPlayerCarIndex", c_uint8)] # Index of secondary player's car in the array (splitscreen)
-    def get_size(self):
-        return 24
-
-@unique
-class PacketId(IntEnum):
-    Motion = 0              # Contains all motion data for player’s car – only sent while player is in control
-    Session = 1             # Data about the session – track, time left
-    LapData = 2             # Data about all the lap times of cars in the session
-    Event = 3               # Various notable events that happen during a session
-    Participants = 4        # List of participants in the session, mostly relevant for multiplayer
-    CarSetups = 5           # Packet detailing car setups for cars in the race
-    CarTelemetry = 6        # Telemetry data for all cars
-    CarStatus = 7           # Status data for all cars
-    FinalClassification = 8 # Final classification confirmation at the end of a race
-    LobbyInfo = 9           # Information about players in a multiplayer lobby
-    CarDamage = 10          # Damage status for all cars
-    SessionHistory = 11     # Lap and tyre data for session
-
-class CarMotionData(Structure):
-    _pack_ = 1
-    _fields_ = [("worldPositionX", c_float),     # World space X position
-                ("worldPositionY", c_float),     # World space Y position
-                ("worldPositionZ", c_float),     # World space Z position
-                ("worldVelocityX", c_float),     # Velocity in world space X
-                ("worldVelocityY", c_float),     # Velocity in world space Y
-                ("worldVelocityZ", c_float),     # Velocity in world space Z
-                ("worldForwardDirX", c_int16),   # World space forward X direction (normalised)
-                ("worldForwardDirY", c_int16),   # World space forward Y direction (normalised)
-                ("worldForwardDirZ", c_int16),   # World space forward Z direction (normalised)
-                ("worldRightDirX", c_int16),     # World space right X direction (normalised)
-                ("worldRightDirY", c_int16),     # World space right Y direction (normalised)
-                ("worldRightDirZ", c_int16),     # World space right Z direction (normalised)
-                ("gForceLateral", c_float),      # Lateral G-Force component
-                ("gForceLongitudinal", c_float), # Longitudinal G-Force component
-                ("gForceVertical", c_float),     # Vertical G-Force component
-                ("yaw", c_float),                # Yaw angle in radians
-                ("pitch", c_float),              # Pitch angle in radians
-                ("roll", c_float)]               # Roll angle in radians
-
-class PacketMotionData(Structure):
-    _pack_ = 1
-    _fields_ = [#("header", PacketHeader),               # Header
-                ("carMotionData", CarMotionData * 22),   # Data for all cars on track
-                # Extra player car ONLY data
-                ("suspensionPosition", c_float * 4),     # Note: All wheel arrays have the following order:
-                ("suspensionVelocity", c_float * 4),     # RL, RR, FL, FR
-                ("suspensionAcceleration", c_float * 4), # RL, RR, FL, FR
-                ("wheelSpeed", c_float * 4),             # Speed of each wheel
-                ("wheelSlip", c_float * 4),              # Slip ratio for each wheel
-                ("localVelocityX", c_float),             # Velocity in local space
-                ("localVelocityY", c_float),             # Velocity in local space
-                ("localVelocityZ", c_float),             # Velocity in local space
-                ("angularVelocityX", c_float),           # Angular velocity x-component
-                ("angularVelocityY", c_float),           # Angular velocity y-component
-                ("angularVelocityZ", c_float),           # Angular velocity z-component
-                ("angularAccelerationX", c_float),       # Angular velocity x-component
-                ("angularAccelerationY", c_float),       # Angular velocity y-component
-                ("angularAccelerationZ", c_float),       # Angular velocity z-component
-                ("frontWheelsAngle", c_float)]           # Current front wheels angle in radians
-    def get_size(self):
-        return 1440
-
-class CarTelemetryData(Structure):
-    _pack_ = 1
-    _fields_ = [("speed", c_uint16),                      # Speed of car in kilometres per hour
-                ("throttle", c_float),                    # Amount of throttle applied (0.0 to 1.0)
-                ("steer", c_float),                       # Steering (-1.0 (full lock left) to 1.0 (full lock right))
-                ("brake", c_float),                       # Amount of brake applied (0.0 to 1.0)
-                ("clutch", c_uint8),                      # Amount of clutch applied (0 to 100)
-                ("gear", c_int8),                         # Gear selected (1-8, N=0, R=-1)
-                ("engineRPM", c_uint16),                  # Engine RPM
-                ("drs", c_uint8),                         # 0 = off, 1 = on
-                ("revLightsPercent", c_uint8),            # Rev lights indicator (percentage)
-                ("revLightsBitValue", c_uint16),          # Rev lights (bit 0 = leftmost LED, bit 14 = rightmost LED)
-                ("brakesTemperature", c_uint16 * 4),      # Brakes temperature (celsius)
-                ("tyresSurfaceTemperature", c_uint8 * 4), # Tyres surface temperature (celsius)
-                ("tyresInnerTemperature", c_uint8 * 4),   # Tyres inner temperature (celsius)
-                ("engineTemperature", c_uint16),          # Engine temperature (celsius)
-                ("tyresPressure", c_float * 4),           # Tyres pressure (PSI)
-                ("surfaceType", c_uint8 * 4)]             # Driving surface, see appendices
-
-class PacketCarTelemetryData(Structure):
-    _pack_ = 1
-    _fields_ = [#("header", PacketHeader),                   # Header
-                ("carTelemetryData", CarTelemetryData * 22), # Data for all cars on track
-                ("mfdPanelIndex", c_uint8),                  # Index of MFD panel open - 255 = MFD closed; Single player, race – 0 = Car setup, 1 = Pits, 2 = Damage, 3 =  Engine, 4 = Temperatures; May vary depending on game mode
-                ("mfdPanelIndexSecondaryPlayer", c_uint8),   # See above
-                ("suggestedGear", c_int8)]                   # Suggested gear for the player (1-8), 0 if no gear suggested
-    def get_size(self):
-        return 1323
+        header = packet.get_header()
+        if header != None and header.packetId < len(PACKET_COUNTER_NAMES):
+            self.stats.count(PACKET_COUNTER_NAMES[header.packetId])
+
+    def __defer_relay(self, packet):
+        # receive buffer of drained datagram can be reused before kept packets are processed, so it is copied
+        if self.relay != None:
+            self.relay.defer(packet.data, packet.size)
+
+    def __keep_latest(self, pending_packets):
+        # returns count of dropped frames, kept packet buffer is swapped with a free one instead of copying
+        packet = self.packet
+        decoder = self.find_decoder(packet)
+        if decoder == None:
+            return 0
+        # packets of one-shot events are processed in order of arrival, none of them is dropped
+        if not decoder.is_latest_only:
+            self.process_packet(packet)
+            return 0
+        held_packet = pending_packets.get(decoder.key)
+        if held_packet == None:
+            pending_packets[decoder.key] = packet
+            self.packet = self.free_packets.pop() if len(self.free_packets) > 0 else PacketBuffer()
+            return 0
+        if packet.is_newer(held_packet):
+            pending_packets[decoder.key] = packet
+            self.packet = held_packet
+        return 1
+
+    def find_decoder(self, packet):
+        # dispatch on header alone, returns None for packets without records subscribed by any target
+        # all targets subscribe the same producers, so decoder of any target tells how the packet is processed
+        if packet.size < sizeof(PacketHeader):
+            return None
+        header = packet.get_header()
+        if header == None:
+            self.report_unsupported_format(packet.header.packetFormat)
+            return None
+        for target in self.targets:
+            decoder = target.decoders.find(header)
+            if decoder != None:
+                return decoder
+        return None
+
+    def report_unsupported_format(self, packet_format):
+        if packet_format in self.unsupported_formats:
+            return
+        self.unsupported_formats.add(packet_format)
+        print("F1 client: unsupported UDP format:", packet_format, "supported formats:", ", ".join(str(packet_format) for packet_format in PACKET_HEADERS))
+
+    def process_packet(self, packet):
+        if packet.size < sizeof(PacketHeader):
+            return
+        start_time = time.perf_counter() if self.stats != None else 0
+        header = packet.get_header()
+        if header == None:
+            self.report_unsupported_format(packet.header.packetFormat)
+            return
+        if self.stats != None:
+            # decode stage of the packet is header parse and dispatch plus reads of its records by all targets
+            self.decode_time = time.perf_counter() - start_time
+        session_time = header.sessionTime
+        self.session_time = session_time
+        # header is parsed once, every target reads records of its own car in place from packet buffer
+        for target in self.targets:
+            # collect events of all decoded records and notify once per target
+            events = list()
+            # every packet advances session time, so events of records that did not come in it may end
+            if self.use_session_clock:
+                self.stop_stale_session_events(target, session_time)
+            for producer in target.timed_producers:
+                if producer.stream.is_active():
+                    expired_events = producer.expire(session_time)
+                    if self.stats != None:
+                        self.stats.count("events_stopped", len(expired_events))
+                    events += expired_events
+            if self.stats != None:
+                start_time = time.perf_counter()
+                decoder = target.decoders.find(header)
+                self.decode_time += time.perf_counter() - start_time
+            else:
+                decoder = target.decoders.find(header)
+            car_index = target.get_car_index(header)
+            if decoder != None and packet.size >= decoder.size and car_index >= 0 and car_index < CARS_COUNT:
+                for producer, engine, offset, car_stride in decoder.entries:
+                    producer.car_index = car_index
+                    events += self.process_record(producer, engine, packet.data, offset + car_index * car_stride, session_time)
+            if len(events) > 0:
+                if target.event_callback == None:
+                    print("F1 client: no client subscribed to events of car", target.car)
+                self.notify(target, events)
+        if self.stats != None:
+            self.stats.record("decode", self.decode_time)
+
+    def process_record(self, producer, engine, data, offset, session_time):
+        if self.stats == None:
+            # filter input signals and generate events
+            producer.events = engine.generate_events(data, (offset,), session_time)
+            # look for finished events and disable them
+            producer.stream.process(producer.events)
+        else:
+            # record is decoded and events are generated in separate steps, so both are timed
+            start_time = time.perf_counter()
+            engine.decode(data, (offset,))
+            generate_start_time = time.perf_counter()
+            self.decode_time += generate_start_time - start_time
+            if producer.filters != None:
+                suppressed_transitions = producer.filters.suppressed_transitions
+                producer.events = engine.generate(session_time)
+                self.stats.count("suppressed_transitions", producer.filters.suppressed_transitions - suppressed_transitions)
+            else:
+                producer.events = engine.generate(session_time)
+            self.process_finished_events(producer.stream, producer.events, generate_start_time)
+        # register event time
+        producer.last_event_time = time.time()
+        producer.last_session_time = session_time
+        return producer.events
+
+    def process_finished_events(self, stream, events, generate_start_time):
+        generate_end_time = time.perf_counter()
+        prev_mask = stream.active_mask
+        stream.process(events)
+        self.stats.record("diff", time.perf_counter() - generate_end_time)
+        self.stats.record("generate", generate_end_time - generate_start_time)
+        self.stats.count("events_started", count_bits(stream.active_mask & ~prev_mask))
+        self.stats.count("events_stopped", count_bits(prev_mask & ~stream.active_mask))
+
+    def stop_stale_events(self, target, stream):
+        if not stream.is_active():
+            return
+        if self.stats != None:
+            self.stats.count("stale_stops")
+            self.stats.count("events_stopped", count_bits(stream.active_mask))
+        self.stop_events(target, stream)
+
+    def stop_stale_session_events(self, target, session_time):
+        for producer in target.producers:
+            if session_time - producer.last_session_time > producer.stop_delay_s:
+                self.stop_stale_events(target, producer.stream)
+
+    def stop_events(self, target, stream):
+        if not stream.is_active():
+            return
+        self.notify(target, stream.stop())
+
+def count_bits(mask):
+    return bin(mask).count("1")
+
+def create_game_socket():
+    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    client.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    client.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    client.bind(("", PORT))
+    return client
+
+class PacketBuffer:
+    # preallocated packet buffer, headers are views over it and never copy data
+    def __init__(self):
+        self.data = bytearray(MAX_PACKET_SIZE)
+        self.size = 0
+        # header is read as the oldest layout first, packetFormat is at the same place in all of them
+        self.header = PacketHeader.from_buffer(self.data)
+        self.header_views = dict()
+        for packet_format, header_type in PACKET_HEADERS.items():
+            self.header_views[packet_format] = header_type.from_buffer(self.data)
+
+    def get_header(self):
+        # header view in the layout of packet format, None for unsupported formats
+        return self.header_views.get(self.header.packetFormat)
+
+    def is_newer(self, packet):
+        # packets of another session always win, otherwise compare frame and session time
+        header = self.get_header()
+        other_header = packet.get_header()
+        if header.sessionUID != other_header.sessionUID:
+            return True
+        if header.frameIdentifier != other_header.frameIdentifier:
+            return header.frameIdentifier > other_header.frameIdentifier
+        return header.sessionTime >= other_header.sessionTime
@@ -0,0 +1,131 @@
+import asyncio
+
+from f1_client import F1Client, PLAYER_CAR, create_game_socket
+
+class AsyncF1Client(F1Client):
+    # F1 game client running on asyncio loop, stale events are stopped by per producer deadline timers instead of polling thread
+    async def start(self, executor=None, capture_writer=None, stats=None, cars=(PLAYER_CAR,), relay=None, event_types=None):
+        # executor - haptic dispatch is run in executor if set, otherwise as a task on the same loop
+        print("Connecting to F1 game socket...")
+        self.loop = asyncio.get_running_loop()
+        self.init_processing(capture_writer, stats, cars, relay, event_types=event_types)
+        # every target has its own dispatcher, so a slow device does not delay events of others
+        self.dispatchers = dict()
+        self.deadlines = dict()
+        for target in self.targets:
+            self.dispatchers[target] = AsyncEventDispatcher(self.loop, target.dispatch, executor)
+            for producer in target.producers:
+                self.deadlines[producer] = StreamDeadline(self.loop, producer.stop_delay_s, lambda target=target, stream=producer.stream: self.stop_stale_events(target, stream))
+        self.transport, protocol = await self.loop.create_datagram_endpoint(lambda: F1DatagramProtocol(self), sock=create_game_socket())
+        self.is_running = True
+        print("Game socket connected.")
+
+    async def shutdown(self):
+        # stops all events and waits until they are dispatched
+        self.stop()
+        for dispatcher in self.dispatchers.values():
+            await dispatcher.join()
+
+    def stop(self):
+        if not getattr(self, "is_running", False):
+            return
+        self.is_running = False
+        self.transport.close()
+        for target in self.targets:
+            for producer in target.producers:
+                self.deadlines[producer].cancel()
+                self.stop_events(target, producer.stream)
+
+    def process_datagram(self, data):
+        # asyncio delivers datagram as bytes, it is copied into preallocated packet buffer
+        packet = self.packet
+        size = len(data)
+        packet.data[:size] = data
+        packet.size = size
+        if self.capture_writer != None:
+            self.capture_writer.write(packet.data, size)
+        if self.stats != None:
+            self.count_packet(packet)
+        self.process_packet(packet)
+        # relay is served after haptic processing
+        if self.relay != None:
+            self.relay.forward(data, size)
+
+    def process_record(self, producer, engine, data, offset, session_time):
+        events = super().process_record(producer, engine, data, offset, session_time)
+        self.deadlines[producer].reset()
+        return events
+
+    def notify(self, target, events):
+        self.dispatchers[target].publish(events)
+
+class F1DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, client):
+        self.client = client
+
+    def datagram_received(self, data, addr):
+        self.client.process_datagram(data)
+
+    def error_received(self, exc):
+        print("F1 client: socket error:", exc)
+
+class StreamDeadline:
+    # calls callback when stream was not reset for delay, timer is moved lazily instead of rescheduling on every packet
+    def __init__(self, loop, delay_s, callback):
+        self.loop = loop
+        self.delay_s = delay_s
+        self.callback = callback
+        self.deadline = None
+        self.handle = None
+
+    def reset(self):
+        self.deadline = self.loop.time() + self.delay_s
+        if self.handle == None:
+            self.handle = self.loop.call_at(self.deadline, self.__expire)
+
+    def cancel(self):
+        if self.handle != None:
+            self.handle.cancel()
+            self.handle = None
+
+    def __expire(self):
+        if self.loop.time() < self.deadline:
+            self.handle = self.loop.call_at(self.deadline, self.__expire)
+            return
+        self.handle = None
+        self.callback()
+
+class AsyncEventDispatcher:
+    # latest-wins event dispatch on asyncio loop, at most one batch is dispatched at a time
+    def __init__(self, loop, callback, executor=None):
+        self.loop = loop
+        self.callback = callback
+        self.executor = executor
+        self.events = dict()
+        self.task = None
+
+    def publish(self, events):
+        # events are copied, rule engine reuses them for the next datagram before dispatch runs
+        for event in events:
+            self.events[event.key] = event.copy()
+        if self.task == None:
+            self.task = self.loop.create_task(self.__run())
+
+    async def join(self):
+        while self.task != None:
+            await self.task
+
+    async def __run(self):
+        try:
+            while len(self.events) > 0:
+                events = list(self.events.values())
+                self.events.clear()
+                try:
+                    if self.executor != None:
+                        await self.loop.run_in_executor(self.executor, self.callback, events)
+                    else:
+                        self.callback(events)
+                except Exception as e:
+                    print("Haptic dispatch: failed to dispatch events:", e)
+        finally:
+            self.task = None
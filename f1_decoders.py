@@ -0,0 +1,112 @@
+import time
+from ctypes import sizeof
+
+from ff_event import FeedbackEventStream
+from ff_rules import RuleEngine
+from ff_filter import FilterBank
+from f1_packets import CARS_COUNT, PACKET_HEADERS, PACKET_LAYOUTS
+
+STOP_EVENTS_DELAY_S = 0.2
+
+class EventProducer:
+    # generates events from one packet record, finished events are tracked by its own stream
+    # subclasses implement compile(structure, header_type) returning an object with generate_events(data, offsets, time)
+    # which is decode(data, offsets) of record fields followed by generate(time) of events, the steps are called separately when stats are timed
+    def __init__(self, source):
+        self.source = source
+        self.events = list()
+        self.stream = FeedbackEventStream()
+        self.last_event_time = time.time()
+        # events are stopped when no record came for this delay
+        self.stop_delay_s = STOP_EVENTS_DELAY_S
+        # only the newest packet is processed when packets are drained by latest-wins receive
+        self.is_latest_only = True
+        # optional FilterBank of producer input signals
+        self.filters = None
+        # index of the car whose record is decoded, set before every record
+        self.car_index = 0
+        # game session time of the last decoded record
+        self.last_session_time = float(0)
+        # events of timed producers expire by game session time, expire(time) is called on every processed packet while they are active
+        self.is_timed = False
+
+class RuleProducer(EventProducer):
+    # generates events from a table of rules over one record
+    def __init__(self, source, rules):
+        super().__init__(source)
+        self.rules = rules
+        if any(rule.filter != None for rule in rules):
+            self.filters = FilterBank(rules)
+
+    def compile(self, structure, header_type):
+        return RuleEngine(self.rules, [(self.source, structure)], self.filters)
+
+class PacketDecoder:
+    # records of one packet layout read by producers
+    # entries - list of (producer, engine, record offset in packet, car record stride)
+    def __init__(self, key, entries, size):
+        self.key = key
+        self.entries = entries
+        # minimal packet size containing all decoded records
+        self.size = size
+        self.is_latest_only = all(producer.is_latest_only for producer, engine, offset, car_stride in entries)
+
+class DecoderRegistry:
+    # compiles decoders of subscribed packet layouts once, packets are dispatched by header alone
+    # is_player - player only records are decoded, registries of other cars skip them
+    def __init__(self, layouts=PACKET_LAYOUTS, is_player=True):
+        self.layouts = layouts
+        self.is_player = is_player
+        self.producers = list()
+        self.engines = dict()
+        self.decoders = dict()
+        # bit per subscribed packet id, other packets are discarded after reading packetId
+        self.subscribed_ids = 0
+
+    def subscribe_rules(self, rules):
+        # rules are grouped into one producer per source record
+        source_rules = dict()
+        for rule in rules:
+            source_rules.setdefault(rule.source, list()).append(rule)
+        for source, rules in source_rules.items():
+            self.subscribe(RuleProducer(source, rules))
+
+    def subscribe(self, producer):
+        self.producers.append(producer)
+        self.__compile()
+
+    def get_packet_ids(self, producer):
+        # ids of packets producer is subscribed to by its source record
+        return sorted(set(key[1] for key, records in self.layouts.items() if producer.source in records))
+
+    def __compile(self):
+        producers = dict((producer.source, producer) for producer in self.producers)
+        self.decoders = dict()
+        self.subscribed_ids = 0
+        for key, records in self.layouts.items():
+            header_type = PACKET_HEADERS[key[0]]
+            header_size = sizeof(header_type)
+            entries = list()
+            size = header_size
+            for source, record in records.items():
+                producer = producers.get(source)
+                if producer == None or (record.is_player_only and not self.is_player):
+                    continue
+                # engines are shared by layouts with the same record structure, e.g. 2021 and 2022
+                engine = self.engines.get((producer, record.structure, header_type))
+                if engine == None:
+                    engine = producer.compile(record.structure, header_type)
+                    self.engines[(producer, record.structure, header_type)] = engine
+                offset = header_size + record.offset
+                entries.append((producer, engine, offset, record.car_stride))
+                size = max(size, offset + (record.car_stride * CARS_COUNT if record.car_stride > 0 else sizeof(record.structure)))
+            # layouts without subscribed records have no decoder
+            if len(entries) > 0:
+                self.decoders[key] = PacketDecoder(key, entries, size)
+                self.subscribed_ids |= 1 << key[1]
+
+    def find(self, header):
+        packet_id = header.packetId
+        if not (self.subscribed_ids >> packet_id) & 1:
+            return None
+        return self.decoders.get((header.packetFormat, packet_id, header.packetVersion))
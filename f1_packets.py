@@ -0,0 +1,319 @@
+from ctypes import *
+from enum import IntEnum, unique
+from collections import namedtuple
+
+# Packet layouts of F1 UDP telemetry by game year, all multi-byte values are little endian
+CARS_COUNT = 22
+
+class PacketHeader(Structure):
+    _pack_ = 1
+    _fields_ = [("packetFormat", c_uint16),           # 2021
+                ("gameMajorVersion", c_uint8),        # Game major version - "X.00"
+                ("gameMinorVersion", c_uint8),        # Game minor version - "1.XX"
+                ("packetVersion", c_uint8),           # Version of this packet type, all start from 1
+                ("packetId", c_uint8),                # Identifier for the packet type, see below
+                ("sessionUID", c_uint64),             # Unique identifier for the session
+                ("sessionTime", c_float),             # Session timestamp
+                ("frameIdentifier", c_uint32),        # Identifier for the frame the data was retrieved on
+                ("playerCarIndex", c_uint8),          # Index of player's car in the array
+                ("secondaryPlayerCarIndex", c_uint8)] # Index of secondary player's car in the array (splitscreen)
+
+class PacketHeader2023(Structure):
+    _pack_ = 1
+    _fields_ = [("packetFormat", c_uint16),           # 2023
+                ("gameYear", c_uint8),                # Game year - last two digits e.g. 23
+                ("gameMajorVersion", c_uint8),        # Game major version - "X.00"
+                ("gameMinorVersion", c_uint8),        # Game minor version - "1.XX"
+                ("packetVersion", c_uint8),           # Version of this packet type, all start from 1
+                ("packetId", c_uint8),                # Identifier for the packet type, see below
+                ("sessionUID", c_uint64),             # Unique identifier for the session
+                ("sessionTime", c_float),             # Session timestamp
+                ("frameIdentifier", c_uint32),        # Identifier for the frame the data was retrieved on
+                ("overallFrameIdentifier", c_uint32), # Overall identifier for the frame, doesn't go back after flashbacks
+                ("playerCarIndex", c_uint8),          # Index of player's car in the array
+                ("secondaryPlayerCarIndex", c_uint8)] # Index of secondary player's car in the array (splitscreen)
+
+@unique
+class PacketId(IntEnum):
+    Motion = 0              # Contains all motion data for player’s car – only sent while player is in control
+    Session = 1             # Data about the session – track, time left
+    LapData = 2             # Data about all the lap times of cars in the session
+    Event = 3               # Various notable events that happen during a session
+    Participants = 4        # List of participants in the session, mostly relevant for multiplayer
+    CarSetups = 5           # Packet detailing car setups for cars in the race
+    CarTelemetry = 6        # Telemetry data for all cars
+    CarStatus = 7           # Status data for all cars
+    FinalClassification = 8 # Final classification confirmation at the end of a race
+    LobbyInfo = 9           # Information about players in a multiplayer lobby
+    CarDamage = 10          # Damage status for all cars
+    SessionHistory = 11     # Lap and tyre data for session
+    TyreSets = 12           # Extended tyre set data (2023+)
+    MotionEx = 13           # Extended motion data for player car (2023+)
+    TimeTrial = 14          # Time trial specific data (2024+)
+
+class CarMotionData(Structure):
+    _pack_ = 1
+    _fields_ = [("worldPositionX", c_float),     # World space X position
+                ("worldPositionY", c_float),     # World space Y position
+                ("worldPositionZ", c_float),     # World space Z position
+                ("worldVelocityX", c_float),     # Velocity in world space X
+                ("worldVelocityY", c_float),     # Velocity in world space Y
+                ("worldVelocityZ", c_float),     # Velocity in world space Z
+                ("worldForwardDirX", c_int16),   # World space forward X direction (normalised)
+                ("worldForwardDirY", c_int16),   # World space forward Y direction (normalised)
+                ("worldForwardDirZ", c_int16),   # World space forward Z direction (normalised)
+                ("worldRightDirX", c_int16),     # World space right X direction (normalised)
+                ("worldRightDirY", c_int16),     # World space right Y direction (normalised)
+                ("worldRightDirZ", c_int16),     # World space right Z direction (normalised)
+                ("gForceLateral", c_float),      # Lateral G-Force component
+                ("gForceLongitudinal", c_float), # Longitudinal G-Force component
+                ("gForceVertical", c_float),     # Vertical G-Force component
+                ("yaw", c_float),                # Yaw angle in radians
+                ("pitch", c_float),              # Pitch angle in radians
+                ("roll", c_float)]               # Roll angle in radians
+
+class CarMotionExData(Structure):
+    _pack_ = 1
+    _fields_ = [# Extra player car ONLY data
+                ("suspensionPosition", c_float * 4),     # Note: All wheel arrays have the following order:
+                ("suspensionVelocity", c_float * 4),     # RL, RR, FL, FR
+                ("suspensionAcceleration", c_float * 4), # RL, RR, FL, FR
+                ("wheelSpeed", c_float * 4),             # Speed of each wheel
+                ("wheelSlip", c_float * 4),              # Slip ratio for each wheel
+                ("localVelocityX", c_float),             # Velocity in local space
+                ("localVelocityY", c_float),             # Velocity in local space
+                ("localVelocityZ", c_float),             # Velocity in local space
+                ("angularVelocityX", c_float),           # Angular velocity x-component
+                ("angularVelocityY", c_float),           # Angular velocity y-component
+                ("angularVelocityZ", c_float),           # Angular velocity z-component
+                ("angularAccelerationX", c_float),       # Angular velocity x-component
+                ("angularAccelerationY", c_float),       # Angular velocity y-component
+                ("angularAccelerationZ", c_float),       # Angular velocity z-component
+                ("frontWheelsAngle", c_float)]           # Current front wheels angle in radians
+
+class PacketMotionData(Structure):
+    _pack_ = 1
+    _anonymous_ = ("motionExData",)
+    _fields_ = [#("header", PacketHeader),                     # Header
+                ("carMotionData", CarMotionData * CARS_COUNT), # Data for all cars on track
+                ("motionExData", CarMotionExData)]             # Extra player car ONLY data
+
+class PacketMotionData2023(Structure):
+    _pack_ = 1
+    _fields_ = [#("header", PacketHeader2023),                 # Header
+                ("carMotionData", CarMotionData * CARS_COUNT)] # Data for all cars on track, player car extra data is sent in MotionEx packet
+
+class CarMotionExData2023(Structure):
+    _pack_ = 1
+    _fields_ = [# Extra player car ONLY data, sent as MotionEx packet
+                ("suspensionPosition", c_float * 4),     # Note: All wheel arrays have the following order:
+                ("suspensionVelocity", c_float * 4),     # RL, RR, FL, FR
+                ("suspensionAcceleration", c_float * 4), # RL, RR, FL, FR
+                ("wheelSpeed", c_float * 4),             # Speed of each wheel
+                ("wheelSlip", c_float * 4),              # Slip ratio for each wheel, named wheelSlipRatio in 2023 spec
+                ("wheelSlipAngle", c_float * 4),         # Slip angles for each wheel
+                ("wheelLatForce", c_float * 4),          # Lateral forces for each wheel
+                ("wheelLongForce", c_float * 4),         # Longitudinal forces for each wheel
+                ("heightOfCOGAboveGround", c_float),     # Height of centre of gravity above ground
+                ("localVelocityX", c_float),             # Velocity in local space
+                ("localVelocityY", c_float),             # Velocity in local space
+                ("localVelocityZ", c_float),             # Velocity in local space
+                ("angularVelocityX", c_float),           # Angular velocity x-component
+                ("angularVelocityY", c_float),           # Angular velocity y-component
+                ("angularVelocityZ", c_float),           # Angular velocity z-component
+                ("angularAccelerationX", c_float),       # Angular velocity x-component
+                ("angularAccelerationY", c_float),       # Angular velocity y-component
+                ("angularAccelerationZ", c_float),       # Angular velocity z-component
+                ("frontWheelsAngle", c_float),           # Current front wheels angle in radians
+                ("wheelVertForce", c_float * 4)]         # Vertical forces for each wheel
+
+class CarMotionExData2024(Structure):
+    _pack_ = 1
+    _fields_ = CarMotionExData2023._fields_ + [
+                ("frontAeroHeight", c_float),            # Front plank edge height above road surface
+                ("rearAeroHeight", c_float),             # Rear plank edge height above road surface
+                ("frontRollAngle", c_float),             # Roll angle of the front suspension
+                ("rearRollAngle", c_float),              # Roll angle of the rear suspension
+                ("chassisYaw", c_float)]                 # Yaw angle of the chassis relative to the direction of motion - radians
+
+class CarTelemetryData(Structure):
+    _pack_ = 1
+    _fields_ = [("speed", c_uint16),                      # Speed of car in kilometres per hour
+                ("throttle", c_float),                    # Amount of throttle applied (0.0 to 1.0)
+                ("steer", c_float),                       # Steering (-1.0 (full lock left) to 1.0 (full lock right))
+                ("brake", c_float),                       # Amount of brake applied (0.0 to 1.0)
+                ("clutch", c_uint8),                      # Amount of clutch applied (0 to 100)
+                ("gear", c_int8),                         # Gear selected (1-8, N=0, R=-1)
+                ("engineRPM", c_uint16),                  # Engine RPM
+                ("drs", c_uint8),                         # 0 = off, 1 = on
+                ("revLightsPercent", c_uint8),            # Rev lights indicator (percentage)
+                ("revLightsBitValue", c_uint16),          # Rev lights (bit 0 = leftmost LED, bit 14 = rightmost LED)
+                ("brakesTemperature", c_uint16 * 4),      # Brakes temperature (celsius)
+                ("tyresSurfaceTemperature", c_uint8 * 4), # Tyres surface temperature (celsius)
+                ("tyresInnerTemperature", c_uint8 * 4),   # Tyres inner temperature (celsius)
+                ("engineTemperature", c_uint16),          # Engine temperature (celsius)
+                ("tyresPressure", c_float * 4),           # Tyres pressure (PSI)
+                ("surfaceType", c_uint8 * 4)]             # Driving surface, see appendices
+
+class PacketCarTelemetryData(Structure):
+    _pack_ = 1
+    _fields_ = [#("header", PacketHeader),                   # Header
+                ("carTelemetryData", CarTelemetryData * CARS_COUNT), # Data for all cars on track
+                ("mfdPanelIndex", c_uint8),                  # Index of MFD panel open - 255 = MFD closed; Single player, race – 0 = Car setup, 1 = Pits, 2 = Damage, 3 =  Engine, 4 = Temperatures; May vary depending on game mode
+                ("mfdPanelIndexSecondaryPlayer", c_uint8),   # See above
+                ("suggestedGear", c_int8)]                   # Suggested gear for the player (1-8), 0 if no gear suggested
+
+class EventDataPenalty(Structure):
+    _pack_ = 1
+    _fields_ = [("penaltyType", c_uint8),      # Penalty type
+                ("infringementType", c_uint8), # Infringement type
+                ("vehicleIdx", c_uint8),       # Vehicle index of the car the penalty is applied to
+                ("otherVehicleIdx", c_uint8),  # Vehicle index of the other car involved
+                ("time", c_uint8),             # Time gained, or time spent doing action in seconds
+                ("lapNum", c_uint8),           # Lap the penalty occurred on
+                ("placesGained", c_uint8)]     # Number of places gained by this
+
+class EventDataCollision(Structure):
+    _pack_ = 1
+    _fields_ = [("vehicle1Idx", c_uint8), # Vehicle index of the first vehicle involved in the collision
+                ("vehicle2Idx", c_uint8)] # Vehicle index of the second vehicle involved in the collision
+
+class EventDataSafetyCar(Structure):
+    _pack_ = 1
+    _fields_ = [("safetyCarType", c_uint8), # 0 = No Safety Car, 1 = Full Safety Car, 2 = Virtual Safety Car, 3 = Formation Lap Safety Car
+                ("eventType", c_uint8)]     # 0 = Deployed, 1 = Returning, 2 = Returned, 3 = Resume Race
+
+class EventDataDetails(Union):
+    _pack_ = 1
+    _fields_ = [# Only details of used events are described, others are larger and follow in the packet
+                ("penalty", EventDataPenalty),
+                ("collision", EventDataCollision),   # 2024+
+                ("safetyCar", EventDataSafetyCar)]   # 2024+
+
+class PacketEventData(Structure):
+    _pack_ = 1
+    _fields_ = [#("header", PacketHeader),          # Header
+                ("eventStringCode", c_uint8 * 4),   # Event string code, e.g. "COLL", "PENA", "SCAR"
+                ("eventDetails", EventDataDetails)] # Event details - should be interpreted differently for each type
+
+class CarDamageData(Structure):
+    _pack_ = 1
+    _fields_ = [("tyresWear", c_float * 4),           # Tyre wear (percentage)
+                ("tyresDamage", c_uint8 * 4),         # Tyre damage (percentage)
+                ("brakesDamage", c_uint8 * 4),        # Brakes damage (percentage)
+                ("frontLeftWingDamage", c_uint8),     # Front left wing damage (percentage)
+                ("frontRightWingDamage", c_uint8),    # Front right wing damage (percentage)
+                ("rearWingDamage", c_uint8),          # Rear wing damage (percentage)
+                ("floorDamage", c_uint8),             # Floor damage (percentage)
+                ("diffuserDamage", c_uint8),          # Diffuser damage (percentage)
+                ("sidepodDamage", c_uint8),           # Sidepod damage (percentage)
+                ("drsFault", c_uint8),                # Indicator for DRS fault, 0 = OK, 1 = fault
+                ("gearBoxDamage", c_uint8),           # Gear box damage (percentage)
+                ("engineDamage", c_uint8),            # Engine damage (percentage)
+                ("engineMGUHWear", c_uint8),          # Engine wear MGU-H (percentage)
+                ("engineESWear", c_uint8),            # Engine wear ES (percentage)
+                ("engineCEWear", c_uint8),            # Engine wear CE (percentage)
+                ("engineICEWear", c_uint8),           # Engine wear ICE (percentage)
+                ("engineMGUKWear", c_uint8),          # Engine wear MGU-K (percentage)
+                ("engineTCWear", c_uint8)]            # Engine wear TC (percentage)
+
+class PacketCarDamageData(Structure):
+    _pack_ = 1
+    _fields_ = [#("header", PacketHeader),              # Header
+                ("carDamageData", CarDamageData * CARS_COUNT)]
+
+class CarDamageData2022(Structure):
+    _pack_ = 1
+    _fields_ = [("tyresWear", c_float * 4),           # Tyre wear (percentage)
+                ("tyresDamage", c_uint8 * 4),         # Tyre damage (percentage)
+                ("brakesDamage", c_uint8 * 4),        # Brakes damage (percentage)
+                ("frontLeftWingDamage", c_uint8),     # Front left wing damage (percentage)
+                ("frontRightWingDamage", c_uint8),    # Front right wing damage (percentage)
+                ("rearWingDamage", c_uint8),          # Rear wing damage (percentage)
+                ("floorDamage", c_uint8),             # Floor damage (percentage)
+                ("diffuserDamage", c_uint8),          # Diffuser damage (percentage)
+                ("sidepodDamage", c_uint8),           # Sidepod damage (percentage)
+                ("drsFault", c_uint8),                # Indicator for DRS fault, 0 = OK, 1 = fault
+                ("ersFault", c_uint8),                # Indicator for ERS fault, 0 = OK, 1 = fault
+                ("gearBoxDamage", c_uint8),           # Gear box damage (percentage)
+                ("engineDamage", c_uint8),            # Engine damage (percentage)
+                ("engineMGUHWear", c_uint8),          # Engine wear MGU-H (percentage)
+                ("engineESWear", c_uint8),            # Engine wear ES (percentage)
+                ("engineCEWear", c_uint8),            # Engine wear CE (percentage)
+                ("engineICEWear", c_uint8),           # Engine wear ICE (percentage)
+                ("engineMGUKWear", c_uint8),          # Engine wear MGU-K (percentage)
+                ("engineTCWear", c_uint8),            # Engine wear TC (percentage)
+                ("engineBlown", c_uint8),             # Engine blown, 0 = OK, 1 = fault
+                ("engineSeized", c_uint8)]            # Engine seized, 0 = OK, 1 = fault
+
+class PacketCarDamageData2022(Structure):
+    _pack_ = 1
+    _fields_ = [#("header", PacketHeader),              # Header
+                ("carDamageData", CarDamageData2022 * CARS_COUNT)]
+
+# Record of a packet that event rules can read:
+# structure - ctypes structure of the record
+# offset    - offset of the record after packet header
+# car_stride - size of per car record for arrays of all cars, 0 for player only records
+# Record of packet layout, car_stride is 0 for records not repeated per car
+# is_player_only - record describes only player car and is not decoded for other cars
+PacketRecord = namedtuple("PacketRecord", ["structure", "offset", "car_stride", "is_player_only"], defaults=[False])
+
+def car_record(structure, packet_structure, field):
+    return PacketRecord(structure, getattr(packet_structure, field).offset, sizeof(structure))
+
+def player_record(structure, offset=0):
+    return PacketRecord(structure, offset, 0, True)
+
+def session_record(structure, offset=0):
+    return PacketRecord(structure, offset, 0)
+
+# Header structure by packet format
+PACKET_HEADERS = {
+    2021: PacketHeader,
+    2022: PacketHeader,
+    2023: PacketHeader2023,
+    2024: PacketHeader2023,
+}
+
+# Records by (packetFormat, packetId, packetVersion), record names are referenced by event producers as source
+PACKET_LAYOUTS = {
+    (2021, PacketId.Motion, 1): {
+        "car_motion": car_record(CarMotionData, PacketMotionData, "carMotionData"),
+        "motion_ex": player_record(CarMotionExData, PacketMotionData.motionExData.offset)},
+    (2021, PacketId.CarTelemetry, 1): {
+        "car_telemetry": car_record(CarTelemetryData, PacketCarTelemetryData, "carTelemetryData")},
+    (2021, PacketId.Event, 1): {
+        "event": session_record(PacketEventData)},
+    (2021, PacketId.CarDamage, 1): {
+        "car_damage": car_record(CarDamageData, PacketCarDamageData, "carDamageData")},
+    (2022, PacketId.Motion, 1): {
+        "car_motion": car_record(CarMotionData, PacketMotionData, "carMotionData"),
+        "motion_ex": player_record(CarMotionExData, PacketMotionData.motionExData.offset)},
+    (2022, PacketId.CarTelemetry, 1): {
+        "car_telemetry": car_record(CarTelemetryData, PacketCarTelemetryData, "carTelemetryData")},
+    (2022, PacketId.Event, 1): {
+        "event": session_record(PacketEventData)},
+    (2022, PacketId.CarDamage, 1): {
+        "car_damage": car_record(CarDamageData2022, PacketCarDamageData2022, "carDamageData")},
+    (2023, PacketId.Motion, 1): {
+        "car_motion": car_record(CarMotionData, PacketMotionData2023, "carMotionData")},
+    (2023, PacketId.MotionEx, 1): {
+        "motion_ex": player_record(CarMotionExData2023)},
+    (2023, PacketId.CarTelemetry, 1): {
+        "car_telemetry": car_record(CarTelemetryData, PacketCarTelemetryData, "carTelemetryData")},
+    (2023, PacketId.Event, 1): {
+        "event": session_record(PacketEventData)},
+    (2023, PacketId.CarDamage, 1): {
+        "car_damage": car_record(CarDamageData2022, PacketCarDamageData2022, "carDamageData")},
+    (2024, PacketId.Motion, 1): {
+        "car_motion": car_record(CarMotionData, PacketMotionData2023, "carMotionData")},
+    (2024, PacketId.MotionEx, 1): {
+        "motion_ex": player_record(CarMotionExData2024)},
+    (2024, PacketId.CarTelemetry, 1): {
+        "car_telemetry": car_record(CarTelemetryData, PacketCarTelemetryData, "carTelemetryData")},
+    (2024, PacketId.Event, 1): {
+        "event": session_record(PacketEventData)},
+    (2024, PacketId.CarDamage, 1): {
+        "car_damage": car_record(CarDamageData2022, PacketCarDamageData2022, "carDamageData")},
+}
@@ -0,0 +1,152 @@
+import struct
+
+from ff_event import FeedbackEvent, FeedbackEventType, FeedbackEventDirection, FeedbackEventLocation
+from ff_rules import normalize
+from f1_decoders import EventProducer
+
+EVENT_PULSE_DURATION_S = 0.3
+COLLISION_INTENSITY = float(1)
+PENALTY_INTENSITY = float(0.6)
+SAFETY_CAR_INTENSITY = float(0.5)
+DAMAGE_CHANGE_THRESHOLD_PERCENT = 1
+DAMAGE_FULL_PULSE_PERCENT = float(30)
+
+EVENT_CODE = struct.Struct("<4s")
+VEHICLE_PAIR = struct.Struct("<BB")
+PENALTY = struct.Struct("<BBB")
+DAMAGE = struct.Struct("<6B")
+# details of event codes producing pulses
+EVENT_DETAILS = {b"COLL": VEHICLE_PAIR, b"PENA": PENALTY, b"SCAR": VEHICLE_PAIR}
+
+class PulseProducer(EventProducer):
+    # one-shot events stay enabled for pulse duration, new pulse of the same kind extends it
+    # pulses expire by game session time of packets, so replays produce the same pulses at any speed
+    def __init__(self, source, pulse_duration_s=EVENT_PULSE_DURATION_S):
+        super().__init__(source)
+        self.pulse_duration_s = pulse_duration_s
+        self.stop_delay_s = pulse_duration_s
+        self.pulses = dict()
+        self.last_time = float("-inf")
+        self.is_timed = True
+        # types of produced events, producer is subscribed only when some of them are consumed
+        self.event_types = ()
+
+    def add_pulse(self, type, direction, location, intensity_percent, time):
+        event = FeedbackEvent(True, True, type, direction, location, intensity_percent, float(0))
+        self.pulses[event.key] = (event, time + self.pulse_duration_s)
+
+    def get_pulses(self, time):
+        # returns new list of not expired pulses, expired ones are disabled by event stream
+        events = list()
+        for key, (event, expire_time) in list(self.pulses.items()):
+            if time < expire_time:
+                events.append(event)
+            else:
+                del self.pulses[key]
+        return events
+
+    def expire(self, time):
+        # called for packets of any type, so pulses end on time even when no packet of producer source comes
+        # returns disable events of expired pulses
+        self.check_time(time)
+        pulses = self.get_pulses(time)
+        count = len(pulses)
+        return self.stream.process(pulses)[count:]
+
+    def check_time(self, time):
+        # new session or flashback, pulses of the previous timeline are dropped
+        if time < self.last_time:
+            self.pulses.clear()
+        self.last_time = time
+
+class RaceEventProducer(PulseProducer):
+    # collision, penalty and safety car pulses from Event packets, every packet is processed
+    def __init__(self):
+        super().__init__("event")
+        self.is_latest_only = False
+        self.event_types = (FeedbackEventType.Collision, FeedbackEventType.Penalty, FeedbackEventType.SafetyCar)
+
+    def compile(self, structure, header_type):
+        return RaceEventDecoder(self, structure, header_type)
+
+class RaceEventDecoder:
+    def __init__(self, producer, structure, header_type):
+        self.producer = producer
+        self.details_offset = structure.eventDetails.offset
+        # code and details of the last decoded event, details are None for codes without pulses
+        self.code = None
+        self.details = None
+
+    def decode(self, data, offsets):
+        offset = offsets[0]
+        self.code = EVENT_CODE.unpack_from(data, offset)[0]
+        details = EVENT_DETAILS.get(self.code)
+        self.details = details.unpack_from(data, offset + self.details_offset) if details != None else None
+
+    def generate_events(self, data, offsets, time=float(0)):
+        self.decode(data, offsets)
+        return self.generate(time)
+
+    def generate(self, time=float(0)):
+        producer = self.producer
+        producer.check_time(time)
+        code = self.code
+        # events of the car the producer is bound to
+        car_index = producer.car_index
+        if code == b"COLL":
+            vehicle1, vehicle2 = self.details
+            if vehicle1 == car_index or vehicle2 == car_index:
+                producer.add_pulse(FeedbackEventType.Collision, FeedbackEventDirection.Undefined, FeedbackEventLocation.Undefined, COLLISION_INTENSITY, time)
+        elif code == b"PENA":
+            penalty_type, infringement_type, vehicle = self.details
+            if vehicle == car_index:
+                producer.add_pulse(FeedbackEventType.Penalty, FeedbackEventDirection.Undefined, FeedbackEventLocation.Undefined, PENALTY_INTENSITY, time)
+        elif code == b"SCAR":
+            safety_car_type, event_type = self.details
+            # pulse when safety car is deployed
+            if safety_car_type != 0 and event_type == 0:
+                producer.add_pulse(FeedbackEventType.SafetyCar, FeedbackEventDirection.Undefined, FeedbackEventLocation.Undefined, SAFETY_CAR_INTENSITY, time)
+        return producer.get_pulses(time)
+
+class DamageProducer(PulseProducer):
+    # pulses when car wing or floor damage grows, intensity follows damage increase
+    def __init__(self):
+        super().__init__("car_damage")
+        self.event_types = (FeedbackEventType.Damage,)
+        # front wing, rear wing and floor damage of the last packet, None until the first packet
+        self.damage = None
+
+    def compile(self, structure, header_type):
+        return DamageDecoder(self, structure)
+
+    def update(self, damage, time):
+        prev_damage = self.damage
+        self.damage = damage
+        if prev_damage == None:
+            return
+        for direction, value, prev_value in zip((FeedbackEventDirection.Front, FeedbackEventDirection.Back, FeedbackEventDirection.Down), damage, prev_damage):
+            increase = value - prev_value
+            if increase >= DAMAGE_CHANGE_THRESHOLD_PERCENT:
+                self.add_pulse(FeedbackEventType.Damage, direction, FeedbackEventLocation.Undefined, normalize(increase, float(0), DAMAGE_FULL_PULSE_PERCENT), time)
+
+class DamageDecoder:
+    def __init__(self, producer, structure):
+        self.producer = producer
+        # wing and floor damage fields follow each other in all formats
+        self.offset = structure.frontLeftWingDamage.offset
+        # wing and floor damage of the last decoded record
+        self.damage = None
+
+    def decode(self, data, offsets):
+        self.damage = DAMAGE.unpack_from(data, offsets[0] + self.offset)
+
+    def generate_events(self, data, offsets, time=float(0)):
+        self.decode(data, offsets)
+        return self.generate(time)
+
+    def generate(self, time=float(0)):
+        producer = self.producer
+        producer.check_time(time)
+        front_left_wing, front_right_wing, rear_wing, floor, diffuser, sidepod = self.damage
+        producer.update((max(front_left_wing, front_right_wing), rear_wing, max(floor, diffuser, sidepod)), time)
+        return producer.get_pulses(time)
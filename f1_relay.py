@@ -0,0 +1,57 @@
+import socket
+
+# Relayed datagrams are sent to local consumers only
+RELAY_HOST = "127.0.0.1"
+
+class PacketRelay:
+    # re-sends received datagrams to local ports after they are processed, so relay never delays haptic events
+    # socket never blocks, datagrams that do not fit into send buffer are dropped and counted
+    def __init__(self, ports, stats=None, host=RELAY_HOST):
+        self.addresses = [(host, port) for port in ports]
+        self.stats = stats
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self.socket.setblocking(False)
+        self.forwarded = 0
+        self.dropped = 0
+        self.errors = 0
+        # datagrams copied by defer until flush
+        self.pending = list()
+
+    def forward(self, data, size):
+        # data - receive buffer, only its first size bytes are sent without copying
+        view = memoryview(data)[:size]
+        self.__send(view)
+        view.release()
+
+    def defer(self, data, size):
+        # copies datagram whose receive buffer is reused before it can be forwarded, e.g. drained by latest-wins receive
+        self.pending.append(bytes(memoryview(data)[:size]))
+
+    def flush(self):
+        # forwards deferred datagrams in order of receiving
+        for datagram in self.pending:
+            self.__send(datagram)
+        self.pending.clear()
+
+    def __send(self, datagram):
+        sendto = self.socket.sendto
+        for address in self.addresses:
+            try:
+                sendto(datagram, address)
+                self.forwarded += 1
+                if self.stats != None:
+                    self.stats.count("relay.forwarded")
+            except BlockingIOError:
+                self.dropped += 1
+                if self.stats != None:
+                    self.stats.count("relay.dropped")
+            except OSError:
+                # e.g. consumer port is closed on Windows, relay to other ports goes on
+                self.errors += 1
+                if self.stats != None:
+                    self.stats.count("relay.errors")
+
+    def close(self):
+        if self.socket.fileno() != -1:
+            self.socket.close()
+            print("Relayed packets:", self.forwarded, "dropped:", self.dropped, "errors:", self.errors)
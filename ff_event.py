@@ -7,6 +7,10 @@ class FeedbackEventType(IntEnum):
     Vibration = 2
     Shaking = 3
     Slip = 4
+    Collision = 5
+    Penalty = 6
+    SafetyCar = 7
+    Damage = 8
 
 @unique
 class FeedbackEventDirection(IntEnum):
@@ -30,8 +34,21 @@ class FeedbackEventLocation(IntEnum):
     RearLeftUp = 7
     RearRightUp = 8
 
+# Events are identified by (type, direction, location) packed into one small integer key
+EVENT_KEYS_COUNT = len(FeedbackEventType) * len(FeedbackEventDirection) * len(FeedbackEventLocation)
+
+def make_event_key(type, direction, location):
+    return (int(type) * len(FeedbackEventDirection) + int(direction)) * len(FeedbackEventLocation) + int(location)
+
+def split_event_key(key):
+    type_direction, location = divmod(key, len(FeedbackEventLocation))
+    type, direction = divmod(type_direction, len(FeedbackEventDirection))
+    return FeedbackEventType(type), FeedbackEventDirection(direction), FeedbackEventLocation(location)
+
 class FeedbackEvent:
-    def __init__(self, is_enable=True, is_continue=True, type=FeedbackEventType.Undefined, direction=FeedbackEventDirection.Undefined, location=FeedbackEventLocation.Undefined, intensity_percent=float(0), frequency_percent=float(0)):
+    __slots__ = ("is_enable", "is_continue", "type", "direction", "location", "intensity_percent", "frequency_percent", "key")
+
+    def __init__(self, is_enable=True, is_continue=True, type=FeedbackEventType.Undefined, direction=FeedbackEventDirection.Undefined, location=FeedbackEventLocation.Undefined, intensity_percent=float(0), frequency_percent=float(0), key=None):
         self.is_enable = is_enable
         self.is_continue = is_continue
         self.type = type
@@ -39,6 +56,48 @@ class FeedbackEvent:
         self.location = location
         self.intensity_percent = intensity_percent
         self.frequency_percent = frequency_percent
+        self.key = key if key != None else make_event_key(type, direction, location)
 
     def is_same(self, event):
-        return self.type == event.type and self.direction == event.direction and self.location == event.location
+        return self.key == event.key
+
+    def copy(self):
+        # disable events are shared and never change, enabled ones may be reused by rule engine for the next packet
+        if not self.is_enable:
+            return self
+        return FeedbackEvent(True, self.is_continue, self.type, self.direction, self.location, self.intensity_percent, self.frequency_percent, self.key)
+
+# Disable events carry no data, so one shared instance per key is reused
+DISABLED_EVENTS = [FeedbackEvent(False, True, *split_event_key(key), key=key) for key in range(EVENT_KEYS_COUNT)]
+
+class FeedbackEventStream:
+    # tracks enabled events of one source as a bitmask of event keys
+    def __init__(self):
+        self.active_mask = 0
+
+    def process(self, events):
+        # appends disable events for keys that were active before and are missing now
+        mask = 0
+        for event in events:
+            if event.is_enable:
+                mask |= 1 << event.key
+        finished_mask = self.active_mask & ~mask
+        self.active_mask = mask
+        append_disabled_events(events, finished_mask)
+        return events
+
+    def stop(self):
+        # returns disable events for all active keys
+        events = list()
+        append_disabled_events(events, self.active_mask)
+        self.active_mask = 0
+        return events
+
+    def is_active(self):
+        return self.active_mask != 0
+
+def append_disabled_events(events, mask):
+    while mask:
+        bit = mask & -mask
+        events.append(DISABLED_EVENTS[bit.bit_length() - 1])
+        mask ^= bit
@@ -0,0 +1,92 @@
+from enum import IntEnum, unique
+from collections import namedtuple
+
+@unique
+class Smoothing(IntEnum):
+    Off = 0           # Raw value
+    MovingAverage = 1 # Average of the last window values kept in ring buffer
+    Ema = 2           # Exponential moving average with alpha = 2 / (window + 1)
+
+# Filter of one rule input signal:
+# window        - smoothing window in packets
+# off_threshold - event is disabled when smoothed value falls below it, None to use rule threshold
+# min_on_s, min_off_s - minimal time in game session seconds event stays enabled or disabled
+SignalFilterSpec = namedtuple("SignalFilterSpec", ["smoothing", "window", "off_threshold", "min_on_s", "min_off_s"],
+                              defaults=[Smoothing.Off, 1, None, float(0), float(0)])
+
+class SignalFilter:
+    # smoothing and hysteresis of one input channel, transitions of raw threshold crossing that did not change state are counted as suppressed
+    def __init__(self, spec, threshold, bank):
+        self.smoothing = int(spec.smoothing)
+        self.window = max(spec.window, 1)
+        self.alpha = 2 / (self.window + 1)
+        self.on_threshold = threshold
+        self.off_threshold = spec.off_threshold if spec.off_threshold != None else threshold
+        self.min_on_s = spec.min_on_s
+        self.min_off_s = spec.min_off_s
+        self.bank = bank
+        # fixed size ring buffer of raw values with running sum
+        self.ring = [float(0)] * self.window
+        self.position = 0
+        self.sum = float(0)
+        self.reset()
+
+    def reset(self):
+        for i in range(self.window):
+            self.ring[i] = float(0)
+        self.position = 0
+        self.sum = float(0)
+        self.count = 0
+        self.value = float(0)
+        self.is_active = False
+        self.is_raw_active = False
+        self.change_time = float("-inf")
+        self.last_time = float("-inf")
+
+    def process(self, value, time):
+        # returns True while event is enabled, smoothed value is kept in value
+        if time < self.last_time:
+            # new session or flashback, history is not related to current signal
+            self.reset()
+        self.last_time = time
+        is_raw_active = value > self.on_threshold
+        smoothing = self.smoothing
+        if smoothing == 1:
+            ring = self.ring
+            position = self.position
+            self.sum += value - ring[position]
+            ring[position] = value
+            self.position = (position + 1) % self.window
+            if self.count < self.window:
+                self.count += 1
+            value = self.sum / self.count
+        elif smoothing == 2:
+            if self.count == 0:
+                self.count = 1
+            else:
+                value = self.value + self.alpha * (value - self.value)
+        self.value = value
+        is_active = self.is_active
+        if is_active:
+            if value < self.off_threshold and time - self.change_time >= self.min_on_s:
+                is_active = False
+        elif value > self.on_threshold and time - self.change_time >= self.min_off_s:
+            is_active = True
+        if is_active != self.is_active:
+            self.is_active = is_active
+            self.change_time = time
+        elif is_raw_active != self.is_raw_active:
+            self.bank.suppressed_transitions += 1
+        self.is_raw_active = is_raw_active
+        return is_active
+
+class FilterBank:
+    # filters of a rule table, None for rules without filter
+    def __init__(self, rules):
+        self.suppressed_transitions = 0
+        self.filters = [SignalFilter(rule.filter, rule.threshold if rule.threshold != None else float("-inf"), self) if rule.filter != None else None for rule in rules]
+
+    def reset(self):
+        for filter in self.filters:
+            if filter != None:
+                filter.reset()
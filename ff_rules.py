@@ -0,0 +1,163 @@
+import struct
+from ctypes import sizeof
+from enum import IntEnum, unique
+from collections import namedtuple
+
+from ff_event import FeedbackEvent, FeedbackEventType, FeedbackEventDirection, FeedbackEventLocation
+
+@unique
+class RuleInput(IntEnum):
+    Positive = 0 # Raw value, rule is triggered above threshold
+    Negative = 1 # Negated value, rule is triggered below negative threshold
+    Absolute = 2 # Absolute value, e.g. for wheel arrays where sign is not relevant
+
+@unique
+class RuleOutput(IntEnum):
+    Intensity = 0
+    Frequency = 1
+
+# Declarative description of one feedback event source:
+# source     - name of packet record the value is read from, e.g. "car_motion" or "motion_ex"
+# field      - ctypes field name in the record structure
+# index      - element index for array fields (wheel arrays order is RL, RR, FL, FR), None for scalar fields
+# threshold  - rule is triggered when input value is above threshold, None for always triggered rule
+# range_min, range_max - normalize range of input value, None to pass value as is
+# curve      - optional function applied to normalized value
+# filter     - optional SignalFilterSpec of input value, threshold is used as its on threshold
+FeedbackRule = namedtuple("FeedbackRule", ["source", "field", "index", "input", "threshold", "range_min", "range_max", "type", "direction", "location", "output", "curve", "filter"],
+                          defaults=[FeedbackEventDirection.Undefined, FeedbackEventLocation.Undefined, RuleOutput.Intensity, None, None])
+
+class RuleEngine:
+    # evaluates a table of rules over packet buffer with one precompiled struct read per source record
+    def __init__(self, rules, sources, filters=None):
+        # sources - list of (source name, record structure type), evaluate takes record offsets in the same order
+        # filters - optional FilterBank of rules, its state is shared by engines of the same rules
+        self.rules = rules
+        self.readers = list()
+        structures = dict(sources)
+        value_positions = dict()
+        position = 0
+        for source_name, structure in sources:
+            fields = dict()
+            for rule in rules:
+                if rule.source == source_name:
+                    offset, code = get_field_location(structure, rule.field, rule.index)
+                    fields[offset] = code
+            reader, indices = compile_reader(fields)
+            for offset, index in indices.items():
+                value_positions[(source_name, offset)] = position + index
+            position += len(indices)
+            self.readers.append(reader)
+        # compiled rules reference value position in concatenated record values
+        self.compiled_rules = list()
+        for i, rule in enumerate(rules):
+            offset, code = get_field_location(structures[rule.source], rule.field, rule.index)
+            threshold = rule.threshold if rule.threshold != None else float("-inf")
+            filter = filters.filters[i] if filters != None else None
+            self.compiled_rules.append((value_positions[(rule.source, offset)], int(rule.input), threshold, rule.range_min, rule.range_max, rule.curve, filter))
+        # preallocated vectors of record values and rule outputs, negative output means rule is not triggered
+        self.values = [float(0)] * position
+        self.outputs = [float(-1)] * len(rules)
+        # one event per rule is reused for every packet, only its output is updated
+        # receivers keeping events after the packet on another thread or task copy them, see FeedbackEvent.copy
+        self.rule_events = [(FeedbackEvent(True, True, rule.type, rule.direction, rule.location), rule.output == RuleOutput.Frequency) for rule in rules]
+        self.events = list()
+
+    def decode(self, data, offsets):
+        # read all subscribed fields of each record at once into values vector
+        values = self.values
+        position = 0
+        for reader, offset in zip(self.readers, offsets):
+            record_values = reader.unpack_from(data, offset)
+            values[position:position + len(record_values)] = record_values
+            position += len(record_values)
+
+    def evaluate(self, time=float(0)):
+        # evaluates rules over the last decoded values
+        # time - game session time of the packet, used by filter hold times
+        # evaluate rules into output vector, enum values are compared as plain ints in this loop
+        values = self.values
+        outputs = self.outputs
+        negative = int(RuleInput.Negative)
+        absolute = int(RuleInput.Absolute)
+        i = 0
+        for value_index, input, threshold, range_min, range_max, curve, filter in self.compiled_rules:
+            value = values[value_index]
+            if input == negative:
+                value = -value
+            elif input == absolute:
+                value = abs(value)
+            if filter is not None:
+                is_active = filter.process(value, time)
+                value = filter.value
+            else:
+                is_active = value > threshold
+            if is_active:
+                if range_min is not None:
+                    if value >= range_max:
+                        value = 1.0
+                    elif value <= range_min:
+                        value = 0.0
+                    else:
+                        value = (value - range_min) / (range_max - range_min)
+                if curve is not None:
+                    value = curve(value)
+                outputs[i] = value
+            else:
+                outputs[i] = -1.0
+            i += 1
+        return outputs
+
+    def generate_events(self, data, offsets, time=float(0)):
+        self.decode(data, offsets)
+        return self.generate(time)
+
+    def generate(self, time=float(0)):
+        # events of the last decoded values, returned list is reused too and is valid until the next call
+        events = self.events
+        events.clear()
+        outputs = self.evaluate(time)
+        for (event, is_frequency), output in zip(self.rule_events, outputs):
+            if output < 0:
+                continue
+            if is_frequency:
+                event.frequency_percent = output
+            else:
+                event.intensity_percent = output
+            events.append(event)
+        return events
+
+def get_field_location(structure, field, index):
+    # returns offset of field element in structure and its struct format code
+    field_type = dict(structure._fields_)[field]
+    offset = getattr(structure, field).offset
+    if index != None:
+        field_type = field_type._type_
+        offset += index * sizeof(field_type)
+    return offset, field_type._type_
+
+def compile_reader(fields):
+    # builds little endian struct skipping unused bytes, returns struct and value index by field offset
+    format = "<"
+    position = 0
+    indices = dict()
+    for offset in sorted(fields):
+        if offset > position:
+            format += str(offset - position) + "x"
+        format += fields[offset]
+        indices[offset] = len(indices)
+        position = offset + struct.calcsize("<" + fields[offset])
+    return struct.Struct(format), indices
+
+def normalize(value, min, max):
+    if (value > max):
+        return float(1)
+    elif (value < min):
+        return float(0)
+    else:
+        return float(value - min) / float(max - min)
+
+def normalize_period_percent(period_percent, period_min, period_max):
+    target_period = ((float(1) - period_percent) * (period_max - period_min)) + period_min
+    percent = target_period / period_max
+    return percent
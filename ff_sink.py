@@ -0,0 +1,31 @@
+from ff_event import EVENT_KEYS_COUNT
+
+class FeedbackEventSink:
+    # stand-in for TsClient when no suit is attached, counts events and optionally logs them to file
+    def __init__(self, log_path=None):
+        self.log_file = open(log_path, "w") if log_path != None else None
+        self.enabled = [0] * EVENT_KEYS_COUNT
+        self.disabled = [0] * EVENT_KEYS_COUNT
+        self.events_count = 0
+        self.batches_count = 0
+
+    def process_ff_events(self, events):
+        self.batches_count += 1
+        for event in events:
+            self.events_count += 1
+            if event.is_enable:
+                self.enabled[event.key] += 1
+            else:
+                self.disabled[event.key] += 1
+            if self.log_file != None:
+                self.log_file.write("%d %s %s %s %d %.3f %.3f\n" % (self.batches_count, event.type.name, event.direction.name, event.location.name, event.is_enable, event.intensity_percent, event.frequency_percent))
+
+    def get_event_types(self):
+        # all events are counted
+        return None
+
+    def close(self):
+        if self.log_file != None:
+            self.log_file.close()
+            self.log_file = None
+        print("Event batches:", self.batches_count, "events:", self.events_count)
@@ -0,0 +1,137 @@
+import json
+import time
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+# Histogram bucket i counts durations below 2^i microseconds, last bucket counts everything longer
+HISTOGRAM_BUCKETS_COUNT = 24
+STATS_WINDOW_S = 10
+STATS_PORT = 20780
+
+class RollingHistogram:
+    # log2 buckets of durations, covers current and previous window, windows are rotated by reporter
+    def __init__(self):
+        self.current = [0] * HISTOGRAM_BUCKETS_COUNT
+        self.previous = [0] * HISTOGRAM_BUCKETS_COUNT
+
+    def record(self, duration_s):
+        index = int(duration_s * 1000000).bit_length()
+        if index >= HISTOGRAM_BUCKETS_COUNT:
+            index = HISTOGRAM_BUCKETS_COUNT - 1
+        self.current[index] += 1
+
+    def rotate(self):
+        self.previous = self.current
+        self.current = [0] * HISTOGRAM_BUCKETS_COUNT
+
+    def get_count(self):
+        return sum(self.current) + sum(self.previous)
+
+    def get_percentile_us(self, percent):
+        # returns upper bound of bucket containing percentile
+        buckets = [current + previous for current, previous in zip(self.current, self.previous)]
+        count = sum(buckets)
+        if count == 0:
+            return None
+        target = count * percent / 100
+        accumulated = 0
+        for i, bucket in enumerate(buckets):
+            accumulated += bucket
+            if accumulated >= target:
+                return 1 << i
+        return 1 << (HISTOGRAM_BUCKETS_COUNT - 1)
+
+class Stats:
+    # counters and duration histograms of pipeline stages, written from receive and haptic threads
+    def __init__(self):
+        self.counters = dict()
+        self.histograms = dict()
+        self.start_time = time.time()
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def record(self, name, duration_s):
+        histogram = self.histograms.get(name)
+        if histogram == None:
+            histogram = RollingHistogram()
+            self.histograms[name] = histogram
+        histogram.record(duration_s)
+
+    def rotate(self):
+        for histogram in list(self.histograms.values()):
+            histogram.rotate()
+
+    def get_snapshot(self):
+        snapshot = {"uptime_s": time.time() - self.start_time, "counters": dict(self.counters), "stages_us": dict()}
+        for name, histogram in list(self.histograms.items()):
+            snapshot["stages_us"][name] = {
+                "count": histogram.get_count(),
+                "p50": histogram.get_percentile_us(50),
+                "p99": histogram.get_percentile_us(99),
+                "max": histogram.get_percentile_us(100),
+            }
+        return snapshot
+
+    def get_summary_line(self, prev_counters=None):
+        # stage percentiles and counters, counters are shown as difference from prev_counters if given
+        parts = list()
+        for name, histogram in sorted(list(self.histograms.items())):
+            p50 = histogram.get_percentile_us(50)
+            if p50 == None:
+                continue
+            parts.append("%s p50<%dus p99<%dus" % (name, p50, histogram.get_percentile_us(99)))
+        for name, value in sorted(list(self.counters.items())):
+            if prev_counters != None:
+                value -= prev_counters.get(name, 0)
+            if value != 0:
+                parts.append("%s %d" % (name, value))
+        return " | ".join(parts)
+
+class StatsReporter:
+    # rotates histogram windows and prints summary line of the last period if enabled
+    def __init__(self, stats, period_s=STATS_WINDOW_S, print_summary=True):
+        self.stats = stats
+        self.period_s = period_s
+        self.print_summary = print_summary
+        self.event = threading.Event()
+        self.thread = threading.Thread(None, self.__run, "StatsReporter", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.event.set()
+        self.thread.join()
+
+    def __run(self):
+        prev_counters = dict(self.stats.counters)
+        while not self.event.wait(self.period_s):
+            summary_line = self.stats.get_summary_line(prev_counters)
+            if self.print_summary and summary_line != "":
+                print("Stats:", summary_line)
+            prev_counters = dict(self.stats.counters)
+            self.stats.rotate()
+
+class StatsServer:
+    # serves stats snapshot as JSON on local HTTP endpoint
+    def __init__(self, stats, port=STATS_PORT):
+        stats_server = self
+        self.stats = stats
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(stats_server.stats.get_snapshot(), indent=2).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+        self.server = HTTPServer(("127.0.0.1", port), Handler)
+        self.thread = threading.Thread(None, self.server.serve_forever, "StatsServer", daemon=True)
+        self.thread.start()
+        print("Stats available at http://127.0.0.1:%d/" % port)
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,122 @@
+import time
+import threading
+
+from ff_event import FeedbackEvent
+
+TICK_RATE_HZ = 100
+# Intensity is extrapolated from the last two game frames at most for this time after the last frame
+MAX_EXTRAPOLATION_S = 0.1
+# Render time behind estimated session time, 0 extrapolates from the last frames, one game frame period interpolates between them
+INTERPOLATION_DELAY_S = 0
+
+class ScheduledEvent:
+    # last two samples of one enabled event by game session time
+    # values are sampled on publish, event is kept only for its type, direction, location and key, so reused events are not copied
+    def __init__(self, event, session_time):
+        self.event = event
+        self.prev_time = session_time
+        self.prev_values = (event.intensity_percent, event.frequency_percent)
+        self.last_time = session_time
+        self.last_values = self.prev_values
+
+    def update(self, event, session_time):
+        values = (event.intensity_percent, event.frequency_percent)
+        if session_time > self.last_time:
+            self.prev_time = self.last_time
+            self.prev_values = self.last_values
+        elif session_time < self.last_time:
+            # new session or flashback, previous sample is not related
+            self.prev_time = session_time
+            self.prev_values = values
+        self.event = event
+        self.last_time = session_time
+        self.last_values = values
+
+    def sample(self, session_time):
+        # linear interpolation between samples, extrapolation after the last one is limited and clamped to 0..1
+        period = self.last_time - self.prev_time
+        if period <= 0:
+            return self.last_values
+        session_time = min(max(session_time, self.prev_time), self.last_time + MAX_EXTRAPOLATION_S)
+        alpha = (session_time - self.prev_time) / period
+        return tuple(min(max(prev_value + (last_value - prev_value) * alpha, float(0)), float(1)) for prev_value, last_value in zip(self.prev_values, self.last_values))
+
+class HapticScheduler:
+    # dispatches latest state of enabled events at fixed tick rate instead of game packet rate
+    def __init__(self, callback, tick_rate_hz=TICK_RATE_HZ, stats=None, interpolation_delay_s=INTERPOLATION_DELAY_S):
+        self.callback = callback
+        self.tick_period_s = 1 / tick_rate_hz
+        self.stats = stats
+        self.interpolation_delay_s = interpolation_delay_s
+        self.lock = threading.Lock()
+        self.scheduled_events = dict()
+        self.disabled_events = dict()
+        # newest game session time and time it was received, used to estimate session time between packets
+        self.session_time = None
+        self.session_receive_time = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(None, self.__run, "HapticScheduler")
+        self.thread.start()
+
+    def publish(self, events, session_time):
+        with self.lock:
+            # small steps back come from packets of other types drained in one batch, large ones from new session or flashback
+            if self.session_time == None or session_time >= self.session_time or session_time < self.session_time - MAX_EXTRAPOLATION_S:
+                self.session_time = session_time
+                self.session_receive_time = time.perf_counter()
+            for event in events:
+                if event.is_enable:
+                    self.disabled_events.pop(event.key, None)
+                    scheduled_event = self.scheduled_events.get(event.key)
+                    if scheduled_event == None:
+                        self.scheduled_events[event.key] = ScheduledEvent(event, session_time)
+                    else:
+                        scheduled_event.update(event, session_time)
+                elif self.scheduled_events.pop(event.key, None) != None:
+                    self.disabled_events[event.key] = event
+
+    def stop(self):
+        # pending disable events are dispatched by the last tick
+        self.stop_event.set()
+        self.thread.join()
+
+    def tick(self):
+        with self.lock:
+            events = list(self.disabled_events.values())
+            self.disabled_events.clear()
+            if len(self.scheduled_events) > 0:
+                render_time = self.session_time + (time.perf_counter() - self.session_receive_time) - self.interpolation_delay_s
+                for scheduled_event in self.scheduled_events.values():
+                    event = scheduled_event.event
+                    intensity_percent, frequency_percent = scheduled_event.sample(render_time)
+                    events.append(FeedbackEvent(True, True, event.type, event.direction, event.location, intensity_percent, frequency_percent, event.key))
+        if len(events) > 0:
+            self.callback(events)
+
+    def __run(self):
+        next_tick_time = time.perf_counter()
+        while True:
+            next_tick_time += self.tick_period_s
+            delay = next_tick_time - time.perf_counter()
+            if delay < 0:
+                # ticks are skipped instead of running late ones back to back
+                if self.stats != None:
+                    self.stats.count("late_ticks")
+                next_tick_time = time.perf_counter()
+            elif self.stop_event.wait(delay):
+                break
+            if self.stop_event.is_set():
+                break
+            try:
+                if self.stats != None:
+                    start_time = time.perf_counter()
+                    self.tick()
+                    self.stats.record("tick", time.perf_counter() - start_time)
+                else:
+                    self.tick()
+            except Exception as e:
+                print("Haptic scheduler: failed to dispatch events:", e)
+        try:
+            self.tick()
+        except Exception as e:
+            print("Haptic scheduler: failed to dispatch events:", e)
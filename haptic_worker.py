@@ -0,0 +1,56 @@
+import threading
+
+class EventMailbox:
+    # bounded latest-wins mailbox, newer event replaces pending event with the same key
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.events = dict()
+        self.is_closed = False
+
+    def publish(self, events):
+        # events are copied, rule engine reuses them for the next packet while worker dispatches
+        with self.condition:
+            for event in events:
+                self.events[event.key] = event.copy()
+            self.condition.notify()
+
+    def take(self):
+        # wait for pending events, returns None when mailbox is closed and empty
+        with self.condition:
+            while len(self.events) == 0:
+                if self.is_closed:
+                    return None
+                self.condition.wait()
+            events = list(self.events.values())
+            self.events.clear()
+            return events
+
+    def close(self):
+        with self.condition:
+            self.is_closed = True
+            self.condition.notify()
+
+class HapticWorker:
+    def __init__(self, callback):
+        self.callback = callback
+        self.mailbox = EventMailbox()
+        self.thread = threading.Thread(None, self.__run, "HapticWorker")
+        self.thread.start()
+
+    def publish(self, events):
+        self.mailbox.publish(events)
+
+    def stop(self):
+        # pending events are still dispatched before worker exits
+        self.mailbox.close()
+        self.thread.join()
+
+    def __run(self):
+        while True:
+            events = self.mailbox.take()
+            if events == None:
+                break
+            try:
+                self.callback(events)
+            except Exception as e:
+                print("Haptic worker: failed to dispatch events:", e)
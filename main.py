@@ -1,23 +1,202 @@
 import os
 import sys
 import time
-
-# Adding Teslasuit Python API to path before using
-ts_api_path = os.environ['TESLASUIT_PYTHON_API_PATH']
-sys.path.append(ts_api_path)
+import signal
+import asyncio
+import argparse
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 import f1_client
-import ts_client
+import f1_client_async
+import f1_capture
+import f1_relay
+import ff_sink
+import ff_stats
+import haptic_scheduler
+
+def create_ts_client():
+    # Adding Teslasuit Python API to path before using
+    ts_api_path = os.environ['TESLASUIT_PYTHON_API_PATH']
+    sys.path.append(ts_api_path)
+    import ts_client
+    return ts_client.TsClient()
+
+def analyze(path, cars):
+    # numpy is needed only for offline analysis
+    import f1_analysis
+    for car in cars:
+        start_time = time.perf_counter()
+        results = f1_analysis.analyze_capture(path, car=car)
+        print("Car:", get_car_name(car), "analyzed in %.2f s" % (time.perf_counter() - start_time))
+        f1_analysis.print_analysis(results)
 
 class F1TeslatuitForceFeedback:
-    def start(self):
+    def start(self, args):
+        source = f1_capture.ReplaySource(args.replay, args.speed) if args.replay != None else None
+        self.ts_client_error = None
+        # stops asyncio main loop from other threads, set by asyncio mode
+        self.stop_async = None
+        capture_writer = f1_capture.CaptureWriter(args.capture) if args.capture != None else None
+        # replay as fast as possible processes every packet in order, dispatches events synchronously and stops stale events by game session time
+        is_fast_replay = source != None and args.speed <= 0
+        # stats are collected only when summary or endpoint is requested
+        stats = None
+        stats_reporter = None
+        stats_server = None
+        if args.stats != None or args.stats_port != None:
+            stats = ff_stats.Stats()
+            stats_reporter = ff_stats.StatsReporter(stats, args.stats if args.stats != None else ff_stats.STATS_WINDOW_S, args.stats != None)
+            if args.stats_port != None:
+                stats_server = ff_stats.StatsServer(stats, args.stats_port)
+        relay = f1_relay.PacketRelay(args.relay, stats) if args.relay != None else None
+        # one client per bound car, each one has its own events and dispatch thread
+        cars = args.car if args.car != None else [f1_client.PLAYER_CAR]
+        if args.no_suit:
+            self.ts_clients = [ff_sink.FeedbackEventSink(get_event_log_path(args.event_log, car, len(cars))) for car in cars]
+        else:
+            self.ts_clients = [create_ts_client()]
+        # events are produced only for types some client consumes
+        event_types = self.ts_clients[0].get_event_types()
+        try:
+            if args.asyncio:
+                asyncio.run(self.run_async(capture_writer, stats, not args.no_suit, cars, relay, event_types))
+            else:
+                self.run(source, capture_writer, stats, is_fast_replay, not args.no_suit, args.tick_rate, cars, relay, event_types)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if capture_writer != None:
+                capture_writer.close()
+            if relay != None:
+                relay.close()
+            if args.no_suit:
+                for ts_client in self.ts_clients:
+                    ts_client.close()
+            if stats_reporter != None:
+                stats_reporter.stop()
+                print("Stats:", stats.get_summary_line())
+            if stats_server != None:
+                stats_server.stop()
+        if self.ts_client_error != None:
+            sys.exit(1)
+
+    def run(self, source, capture_writer, stats, is_fast_replay, is_suit, tick_rate_hz=None, cars=(f1_client.PLAYER_CAR,), relay=None, event_types=None):
         self.f1_client = f1_client.F1Client()
-        self.ts_client = ts_client.TsClient()
-        self.f1_client.init()
-        self.f1_client.set_event_callback(self.ts_client.process_ff_events)
-        self.ts_client.init()
-        while True:
-            self.f1_client.process()
-
-ff = F1TeslatuitForceFeedback()
-ff.start()
+        self.f1_client.init(use_haptic_worker=not is_fast_replay, source=source, capture_writer=capture_writer, stats=stats, tick_rate_hz=tick_rate_hz, cars=cars, relay=relay, use_session_clock=is_fast_replay, event_types=event_types)
+        self.set_event_callbacks()
+        if is_suit:
+            if tick_rate_hz != None:
+                # updates are already paced by scheduler ticks
+                self.start_ts_client(stats=stats, multipliers_min_interval_s=0)
+            else:
+                self.start_ts_client(stats=stats)
+        try:
+            while True:
+                if is_fast_replay:
+                    self.f1_client.process()
+                else:
+                    self.f1_client.process_latest()
+        except EOFError:
+            print("Replay finished.")
+        finally:
+            self.f1_client.stop()
+
+    async def run_async(self, capture_writer, stats, is_suit, cars=(f1_client.PLAYER_CAR,), relay=None, event_types=None):
+        # SDK calls run in executor so they never block the loop, thread per car keeps order of every device calls
+        executor = ThreadPoolExecutor(len(cars), "HapticDispatch")
+        self.f1_client = f1_client_async.AsyncF1Client()
+        await self.f1_client.start(executor, capture_writer, stats, cars, relay, event_types)
+        self.set_event_callbacks()
+        loop = asyncio.get_running_loop()
+        stop_event = asyncio.Event()
+        self.stop_async = lambda: loop.call_soon_threadsafe(stop_event.set)
+        if is_suit:
+            self.start_ts_client(stats=stats)
+        try:
+            await stop_event.wait()
+        finally:
+            await self.f1_client.shutdown()
+            executor.shutdown()
+
+    def set_event_callbacks(self):
+        for target_index, ts_client in enumerate(self.ts_clients):
+            self.f1_client.set_event_callback(ts_client.process_ff_events, target_index)
+
+    def start_ts_client(self, **kwargs):
+        # device discovery and asset loading run while game packets are already received, events are ignored until device is connected
+        thread = threading.Thread(None, self.init_ts_client, "TsClientInit", kwargs=kwargs, daemon=True)
+        thread.start()
+
+    def init_ts_client(self, **kwargs):
+        try:
+            self.ts_clients[0].init(**kwargs)
+        except Exception as e:
+            # without device there is no feedback, so application is stopped instead of receiving packets for nothing
+            print("Teslasuit client failed to start:", e)
+            traceback.print_exc()
+            self.ts_client_error = e
+            if self.stop_async != None:
+                self.stop_async()
+            else:
+                # real SIGINT interrupts blocking socket receive of main thread, which then stops with KeyboardInterrupt
+                # Windows can not deliver it to a blocked receive, there os.kill terminates the process with nonzero exit code
+                os.kill(os.getpid(), signal.SIGINT)
+
+def parse_car(value):
+    # player, secondary (splitscreen) or car index in session
+    if value == "player":
+        return f1_client.PLAYER_CAR
+    if value == "secondary":
+        return f1_client.SECONDARY_PLAYER_CAR
+    try:
+        car_index = int(value)
+    except ValueError:
+        car_index = -1
+    if car_index < 0 or car_index >= f1_client.CARS_COUNT:
+        raise argparse.ArgumentTypeError("expected player, secondary or car index 0..%d" % (f1_client.CARS_COUNT - 1))
+    return car_index
+
+def get_event_log_path(log_path, car, cars_count):
+    # log of every car is written to its own file when more than one car is bound
+    if log_path == None or cars_count == 1:
+        return log_path
+    root, extension = os.path.splitext(log_path)
+    return root + "." + get_car_name(car) + extension
+
+def get_car_name(car):
+    return {f1_client.PLAYER_CAR: "player", f1_client.SECONDARY_PLAYER_CAR: "secondary"}.get(car, str(car))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Teslasuit force feedback for F1 game")
+    parser.add_argument("--capture", metavar="PATH", help="write received game packets to capture file")
+    parser.add_argument("--replay", metavar="PATH", help="replay game packets from capture file instead of game socket")
+    parser.add_argument("--speed", type=float, default=1, help="replay speed multiplier, 0 to replay as fast as possible")
+    parser.add_argument("--no-suit", action="store_true", help="run without Teslasuit device, events are only counted")
+    parser.add_argument("--event-log", metavar="PATH", help="write events to log file, used with --no-suit")
+    parser.add_argument("--stats", type=float, metavar="SECONDS", help="print pipeline stage durations and counters every SECONDS")
+    parser.add_argument("--stats-port", type=int, metavar="PORT", nargs="?", const=ff_stats.STATS_PORT, help="serve pipeline stats as JSON on local HTTP port, default %d" % ff_stats.STATS_PORT)
+    parser.add_argument("--asyncio", action="store_true", help="receive game packets on asyncio loop, can not be used with --replay")
+    parser.add_argument("--tick-rate", type=float, metavar="HZ", nargs="?", const=haptic_scheduler.TICK_RATE_HZ, help="dispatch haptic updates at fixed rate with intensity interpolated between game frames, default %d Hz" % haptic_scheduler.TICK_RATE_HZ)
+    parser.add_argument("--car", type=parse_car, action="append", metavar="CAR", help="generate events of car: player (default), secondary for splitscreen or car index, repeat to bind several cars")
+    parser.add_argument("--analyze", metavar="PATH", help="evaluate feedback rules over all packets of capture file and print their trigger rates and output distribution, needs numpy")
+    parser.add_argument("--relay", type=int, nargs="+", metavar="PORT", help="forward every received game packet to local UDP ports for other telemetry tools")
+    args = parser.parse_args()
+    if args.asyncio and args.replay != None:
+        parser.error("--asyncio can not be used with --replay")
+    if args.asyncio and args.tick_rate != None:
+        parser.error("--asyncio can not be used with --tick-rate")
+    if args.relay != None and any(port <= 0 or port > 65535 or port == f1_client.PORT for port in args.relay):
+        parser.error("--relay ports must be 1..65535 and differ from game port %d" % f1_client.PORT)
+    # Teslasuit API used here only waits for the last attached device, so several suits can not be told apart
+    if not args.no_suit and args.analyze == None and args.car != None and len(args.car) > 1:
+        parser.error("several --car bindings are only supported with --no-suit, bind devices with TsClient.init(api=..., device=...) to drive several suits")
+    return args
+
+args = parse_args()
+if args.analyze != None:
+    analyze(args.analyze, args.car if args.car != None else [f1_client.PLAYER_CAR])
+else:
+    ff = F1TeslatuitForceFeedback()
+    ff.start(args)
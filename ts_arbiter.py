@@ -0,0 +1,93 @@
+import time
+
+from ff_event import FeedbackEventType
+
+# Higher priority events preempt lower ones when playables budget is exceeded
+# Collision, damage, penalty and safety car priorities apply once their assets are mapped in ts_client.py
+EVENT_PRIORITIES = {
+    FeedbackEventType.Collision: 6,
+    FeedbackEventType.Damage: 5,
+    FeedbackEventType.Penalty: 4,
+    FeedbackEventType.SafetyCar: 4,
+    FeedbackEventType.GForce: 3,
+    FeedbackEventType.Slip: 2,
+    FeedbackEventType.Shaking: 1,
+    FeedbackEventType.Vibration: 1,
+}
+MAX_PLAYING_ASSETS = 6
+MAX_SDK_CALLS_PER_S = 300
+# Unused SDK calls budget is accumulated for at most this time
+SDK_CALLS_BURST_S = 0.1
+
+class EventArbiter:
+    # chooses which requested assets play within playables and SDK calls budget
+    def __init__(self, playlist, stats=None, max_playing=MAX_PLAYING_ASSETS, max_calls_per_s=MAX_SDK_CALLS_PER_S, priorities=EVENT_PRIORITIES):
+        self.playlist = playlist
+        self.stats = stats
+        self.max_playing = max_playing
+        self.max_calls_per_s = max_calls_per_s
+        self.priorities = priorities
+        # enabled events by asset name, kept until disable event
+        self.requests = dict()
+        self.playing = set()
+        self.calls_budget = max_calls_per_s * SDK_CALLS_BURST_S
+        self.budget_time = time.monotonic()
+        self.preempted = 0
+        self.merged = 0
+        self.deferred = 0
+
+    def request(self, name, event):
+        self.requests[name] = event
+
+    def cancel(self, name):
+        self.requests.pop(name, None)
+
+    def apply(self):
+        # selected assets are ranked by priority, already playing ones win over new ones of the same priority to avoid flipping
+        playing = self.playing
+        ranked = sorted(self.requests.items(), key=lambda item: (self.priorities.get(item[1].type, 0), item[0] in playing, item[1].intensity_percent), reverse=True)
+        selected = ranked[:self.max_playing]
+        # preempted events of the same type as a selected one are merged into it by intensity
+        merged_intensities = dict()
+        for name, event in ranked[self.max_playing:]:
+            merged_intensities[event.type] = max(merged_intensities.get(event.type, float(0)), event.intensity_percent)
+        selected_names = set(name for name, event in selected)
+        calls_budget = self.__refill_budget()
+        start_calls = self.playlist.sdk_calls
+        playlist = self.playlist
+        playlist.begin_batch()
+        for name in list(playing):
+            if name not in selected_names:
+                playlist.stop(name)
+                playing.discard(name)
+                if name in self.requests:
+                    self.preempted += 1
+                    self.__count("arbiter.preempted")
+        for name, event in selected:
+            intensity_percent = event.intensity_percent
+            merged_intensity = merged_intensities.pop(event.type, None)
+            if merged_intensity != None:
+                self.merged += 1
+                self.__count("arbiter.merged")
+                if merged_intensity > intensity_percent:
+                    intensity_percent = merged_intensity
+            playlist.play(name, event.is_continue, intensity_percent, event.frequency_percent)
+            playing.add(name)
+        # stops are always made, starts and multipliers updates over budget are deferred to next batch
+        max_calls = max(int(calls_budget) - (playlist.sdk_calls - start_calls), 0)
+        commit_calls = playlist.sdk_calls
+        playlist.commit_batch(max_calls)
+        self.calls_budget -= playlist.sdk_calls - start_calls
+        if playlist.sdk_calls - commit_calls >= max_calls and len(playlist.dirty_assets) > 0:
+            self.deferred += 1
+            self.__count("arbiter.deferred")
+
+    def __refill_budget(self):
+        now = time.monotonic()
+        self.calls_budget = min(self.calls_budget + (now - self.budget_time) * self.max_calls_per_s, self.max_calls_per_s * SDK_CALLS_BURST_S)
+        self.budget_time = now
+        return self.calls_budget
+
+    def __count(self, name):
+        if self.stats != None:
+            self.stats.count(name)
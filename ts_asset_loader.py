@@ -0,0 +1,38 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+ASSET_EXTENSION = ".ts_asset"
+ASSET_LOAD_THREADS = 4
+
+class AssetLoader:
+    # parses assets on a thread pool in background, e.g. while waiting for device
+    def __init__(self, asset_manager, assets_path, threads=ASSET_LOAD_THREADS):
+        self.asset_manager = asset_manager
+        self.assets_path = assets_path
+        self.futures = dict()
+        executor = ThreadPoolExecutor(threads, "AssetLoader")
+        for name in sorted(os.listdir(assets_path)):
+            if not name.endswith(ASSET_EXTENSION):
+                continue
+            path = os.path.join(assets_path, name)
+            # printed before submit, so lines of pool threads do not mix
+            print("Load asset: ", path)
+            self.futures[name] = executor.submit(asset_manager.load_asset_from_path, path)
+        executor.shutdown(wait=False)
+
+    def get_names(self):
+        return sorted(self.futures)
+
+    def get_handle(self, name):
+        # waits until asset is loaded, raises load error of the asset
+        return self.futures[name].result()
+
+    def wait(self):
+        for future in self.futures.values():
+            future.exception()
+
+    def unload(self):
+        for future in self.futures.values():
+            if future.exception() == None:
+                self.asset_manager.unload_asset(future.result())
+        self.futures.clear()
@@ -3,19 +3,36 @@ from teslasuit_sdk.subsystems import ts_haptic
 from teslasuit_sdk.ts_mapper import TsBone2dIndex
 
 import ts_playlist
-from ff_event import FeedbackEvent, FeedbackEventType, FeedbackEventDirection, FeedbackEventLocation
+from ts_arbiter import EventArbiter
+from ts_asset_loader import AssetLoader
+from ff_event import FeedbackEvent, FeedbackEventType, FeedbackEventDirection, FeedbackEventLocation, EVENT_KEYS_COUNT, make_event_key
 
 class TsClient:
-    def init(self, lib_path=None):
-        print("Connecting teslasuit device...")
-        api = ts_api.TsApi(lib_path)
-        device = api.get_device_manager().get_or_wait_last_device_attached()
+    def __init__(self):
+        # events are ignored until device is connected and playlist is created
+        self.playlist = None
+        self.arbiter = None
+        self.dropped_batches = 0
+
+    def init(self, lib_path=None, stats=None, multipliers_min_interval_s=ts_playlist.MULTIPLIERS_MIN_UPDATE_INTERVAL_S, api=None, device=None):
+        # api, device - shared API and device bound to this client when several suits are driven by one process, last attached device by default
+        if api == None:
+            api = ts_api.TsApi(lib_path)
+        # assets are parsed while waiting for device
+        print("Loading TS assets...")
+        asset_loader = AssetLoader(api.asset_manager, "ts_assets")
+        if device == None:
+            print("Connecting teslasuit device...")
+            device = api.get_device_manager().get_or_wait_last_device_attached()
         self.player = device.haptic
         self.bones = api.mapper.get_layout_bones(api.mapper.get_haptic_electric_channel_layout(device.get_mapping()))
         print("Device connected.")
-        print("Loading TS assets...")
-        self.playlist = ts_playlist.TsPlaylist(api, device, "ts_assets")
-        print("TS assets loaded.")
+        # playables are created on first play, so feedback starts before all assets are parsed
+        self.playlist = ts_playlist.TsPlaylist(api, device, "ts_assets", stats, multipliers_min_interval_s=multipliers_min_interval_s, asset_loader=asset_loader)
+        # limits simultaneously playing assets and SDK calls rate by event priorities
+        self.arbiter = EventArbiter(self.playlist, stats)
+        if self.dropped_batches > 0:
+            print("TS client: event batches dropped before device was ready:", self.dropped_batches)
 
     def play_touch(self, params, channels, duration_ms):
         playable_id = player.create_touch(params, channels, duration_ms)
@@ -29,44 +46,47 @@ class TsClient:
         time.sleep(duration_ms / 1000)
 
     def process_ff_events(self, events):
-        asset = None
+        if self.arbiter == None:
+            if self.dropped_batches == 0:
+                print("TS client: device is not ready yet, events are dropped")
+            self.dropped_batches += 1
+            return
+        # events of one frame are arbitrated and committed to device as one batch
         for event in events:
             asset_name = self.get_asset_name(event)
             if asset_name == None:
                 continue
             if event.is_enable:
-                self.playlist.play(asset_name, event.is_continue, event.intensity_percent, event.frequency_percent)
+                self.arbiter.request(asset_name, event)
             else:
-                self.playlist.stop(asset_name)
+                self.arbiter.cancel(asset_name)
+        self.arbiter.apply()
+
+    def get_event_types(self):
+        # event types with haptic assets, producers of other types are not needed
+        return set(key[0] for key in ASSET_NAMES_TABLE)
 
     def get_asset_name(self, event):
-        if event.type == FeedbackEventType.GForce:
-            if event.direction == FeedbackEventDirection.Back:
-                return "_g_force_back.ts_asset"
-            elif event.direction == FeedbackEventDirection.Front:
-                return "_g_force_front.ts_asset"
-            elif event.direction == FeedbackEventDirection.Left:
-                return "_g_force_left.ts_asset"
-            elif event.direction == FeedbackEventDirection.Right:
-                return "_g_force_right.ts_asset"
-        elif event.type == FeedbackEventType.Vibration:
-            return "_rpm_vibration.ts_asset"
-        elif event.type == FeedbackEventType.Slip:
-            if event.location == FeedbackEventLocation.FrontLeftDown:
-                return "_slip_fl.ts_asset"
-            elif event.location == FeedbackEventLocation.FrontRightDown:
-                return "_slip_fr.ts_asset"
-            elif event.location == FeedbackEventLocation.RearLeftDown:
-                return "_slip_rl.ts_asset"
-            elif event.location == FeedbackEventLocation.RearRightDown:
-                return "_slip_rr.ts_asset"
-        elif event.type == FeedbackEventType.Shaking:
-            if event.location == FeedbackEventLocation.FrontLeftDown:
-                return "_shaking_fl.ts_asset"
-            elif event.location == FeedbackEventLocation.FrontRightDown:
-                return "_shaking_fr.ts_asset"
-            elif event.location == FeedbackEventLocation.RearLeftDown:
-                return "_shaking_rl.ts_asset"
-            elif event.location == FeedbackEventLocation.RearRightDown:
-                return "_shaking_rr.ts_asset"
-        return None
+        return ASSET_NAMES[event.key]
+
+ASSET_NAMES_TABLE = {
+    (FeedbackEventType.GForce, FeedbackEventDirection.Back, FeedbackEventLocation.Undefined): "_g_force_back.ts_asset",
+    (FeedbackEventType.GForce, FeedbackEventDirection.Front, FeedbackEventLocation.Undefined): "_g_force_front.ts_asset",
+    (FeedbackEventType.GForce, FeedbackEventDirection.Left, FeedbackEventLocation.Undefined): "_g_force_left.ts_asset",
+    (FeedbackEventType.GForce, FeedbackEventDirection.Right, FeedbackEventLocation.Undefined): "_g_force_right.ts_asset",
+    (FeedbackEventType.Vibration, FeedbackEventDirection.Undefined, FeedbackEventLocation.Undefined): "_rpm_vibration.ts_asset",
+    (FeedbackEventType.Slip, FeedbackEventDirection.Undefined, FeedbackEventLocation.FrontLeftDown): "_slip_fl.ts_asset",
+    (FeedbackEventType.Slip, FeedbackEventDirection.Undefined, FeedbackEventLocation.FrontRightDown): "_slip_fr.ts_asset",
+    (FeedbackEventType.Slip, FeedbackEventDirection.Undefined, FeedbackEventLocation.RearLeftDown): "_slip_rl.ts_asset",
+    (FeedbackEventType.Slip, FeedbackEventDirection.Undefined, FeedbackEventLocation.RearRightDown): "_slip_rr.ts_asset",
+    (FeedbackEventType.Shaking, FeedbackEventDirection.Undefined, FeedbackEventLocation.FrontLeftDown): "_shaking_fl.ts_asset",
+    (FeedbackEventType.Shaking, FeedbackEventDirection.Undefined, FeedbackEventLocation.FrontRightDown): "_shaking_fr.ts_asset",
+    (FeedbackEventType.Shaking, FeedbackEventDirection.Undefined, FeedbackEventLocation.RearLeftDown): "_shaking_rl.ts_asset",
+    (FeedbackEventType.Shaking, FeedbackEventDirection.Undefined, FeedbackEventLocation.RearRightDown): "_shaking_rr.ts_asset",
+    # Collision, Penalty, SafetyCar and Damage events have no haptic assets yet and are not played
+}
+
+# Asset name by event key, None for events without asset
+ASSET_NAMES = [None] * EVENT_KEYS_COUNT
+for asset_event, asset_name in ASSET_NAMES_TABLE.items():
+    ASSET_NAMES[make_event_key(*asset_event)] = asset_name
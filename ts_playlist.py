@@ -1,34 +1,81 @@
-import os
+import time
 
 from teslasuit_sdk import ts_api
 from teslasuit_sdk.subsystems import ts_haptic
 from teslasuit_sdk.ts_mapper import TsBone2dIndex
 
+from ts_asset_loader import AssetLoader
+
+MULTIPLIERS_CHANGE_EPSILON = 0.01
+MULTIPLIERS_MIN_UPDATE_INTERVAL_S = 0.02
+
 class TsPlaylist:
-    def __init__(self, api, device, assets_path):
+    def __init__(self, api, device, assets_path, stats=None, multipliers_epsilon=MULTIPLIERS_CHANGE_EPSILON, multipliers_min_interval_s=MULTIPLIERS_MIN_UPDATE_INTERVAL_S, asset_loader=None):
+        # asset_loader - loader already started for assets_path, e.g. while waiting for device
         self.api = api
         self.asset_manager = api.asset_manager
         self.device = device
         self.player = self.device.haptic
-        self.__load_assets(assets_path)
+        # optional SDK call durations and play/stop counters
+        self.stats = stats
+        self.multipliers_epsilon = multipliers_epsilon
+        self.multipliers_min_interval_s = multipliers_min_interval_s
+        # assets with not yet applied changes, committed to SDK as one batch
+        self.dirty_assets = dict()
+        self.is_batch = False
+        self.sdk_calls = 0
+        self.sdk_calls_saved = 0
+        self.__load_assets(assets_path, asset_loader)
 
     def __del__(self):
         self.__unload_assets()
 
-    def __load_assets(self, assets_path):
+    def __load_assets(self, assets_path, asset_loader):
+        # assets are parsed in background, playable is created on first play of asset
+        self.asset_loader = asset_loader if asset_loader != None else AssetLoader(self.asset_manager, assets_path)
         self.assets = dict()
-        for file in os.listdir(assets_path):
-            if file.endswith(".ts_asset"):
-                path = os.path.join(assets_path, file)
-                print("Load asset: ", path)
-                asset_handle = self.asset_manager.load_asset_from_path(path)
-                playable_id = self.player.create_playable(asset_handle, True)
-                self.assets[file] = TsAssetInfo(file, asset_handle, playable_id)
-                
+        for name in self.asset_loader.get_names():
+            self.assets[name] = TsAssetInfo(name, None, None)
+
+    def wait_assets(self):
+        # waits until all assets are parsed and creates their playables
+        self.asset_loader.wait()
+        # assets failed to load are removed from playlist while iterating
+        for asset_info in list(self.assets.values()):
+            self.__create_playable(asset_info)
+
+    def __create_playable(self, asset_info):
+        # returns False if asset failed to load, such asset is removed from playlist
+        if asset_info.playable_id != None:
+            return True
+        try:
+            asset_info.asset_handle = self.asset_loader.get_handle(asset_info.name)
+        except Exception as e:
+            print("Asset not loaded: ", asset_info.name, e)
+            self.assets.pop(asset_info.name, None)
+            self.dirty_assets.pop(asset_info.name, None)
+            return False
+        asset_info.playable_id = self.player.create_playable(asset_info.asset_handle, True)
+        return True
+
     def __unload_assets(self):
-        for asset_info in self.assets:
-            self.player.remove_playable(asset_info.playable_id)
-            self.asset_manager.unload_asset(asset_info.asset_handle)
+        if getattr(self, "asset_loader", None) == None:
+            return
+        for asset_info in self.assets.values():
+            if asset_info.playable_id != None:
+                self.player.remove_playable(asset_info.playable_id)
+                asset_info.playable_id = None
+        # assets with the same content share one handle, so handles are unloaded by loader
+        self.asset_loader.unload()
+        self.asset_loader = None
+
+    def begin_batch(self):
+        # play calls are collected until commit_batch, only last value per asset is applied
+        self.is_batch = True
+
+    def commit_batch(self, max_calls=None):
+        self.is_batch = False
+        self.commit(max_calls)
 
     def play(self, name, is_continue=True, intensity_percent=1, frequency_percent=1):
         # find asset info
@@ -40,24 +87,90 @@ class TsPlaylist:
         # stop before restart if not continue
         if not is_continue:
             self.stop(name)
-        # set multipliers
-        multipliers = self.player.create_touch_multipliers(frequency_percent, intensity_percent, intensity_percent)
-        self.player.set_playable_multipliers(asset_info.playable_id, multipliers)
-        # start if not playing
+        # store multipliers and start request until commit
+        asset_info.pending_multipliers = (frequency_percent, intensity_percent)
         if not asset_info.is_playing:
-            print("Play:", asset_info.name)
             asset_info.is_playing = True
-            self.player.play_playable(asset_info.playable_id)
+            asset_info.is_play_pending = True
+        self.dirty_assets[name] = asset_info
+        if not self.is_batch:
+            self.commit()
+
+    def commit(self, max_calls=None):
+        # max_calls - SDK calls budget, assets left after it is spent stay dirty until next commit
+        now = time.monotonic()
+        start_calls = self.sdk_calls
+        for name in list(self.dirty_assets):
+            asset_info = self.dirty_assets[name]
+            # starting asset takes multipliers and play calls, both have to fit into budget
+            calls = 2 if asset_info.is_play_pending else 1
+            if max_calls != None and self.sdk_calls - start_calls + calls > max_calls:
+                break
+            if not self.__create_playable(asset_info):
+                continue
+            self.__apply_multipliers(asset_info, now)
+            # start if not playing
+            if asset_info.is_play_pending:
+                asset_info.is_play_pending = False
+                self.__call_sdk("play", self.player.play_playable, asset_info.playable_id)
+            # keep asset dirty while multipliers update is deferred by min interval
+            if asset_info.pending_multipliers == None:
+                del self.dirty_assets[name]
+
+    def __apply_multipliers(self, asset_info, now):
+        multipliers = asset_info.pending_multipliers
+        if multipliers == None:
+            return
+        applied_multipliers = asset_info.applied_multipliers
+        if applied_multipliers != None:
+            if abs(multipliers[0] - applied_multipliers[0]) <= self.multipliers_epsilon and abs(multipliers[1] - applied_multipliers[1]) <= self.multipliers_epsilon:
+                asset_info.pending_multipliers = None
+                self.__count_saved_call()
+                return
+            if not asset_info.is_play_pending and now - asset_info.multipliers_update_time < self.multipliers_min_interval_s:
+                self.__count_saved_call()
+                return
+        # set multipliers
+        frequency_percent, intensity_percent = multipliers
+        sdk_multipliers = self.player.create_touch_multipliers(frequency_percent, intensity_percent, intensity_percent)
+        self.__call_sdk("multipliers", self.player.set_playable_multipliers, asset_info.playable_id, sdk_multipliers)
+        asset_info.applied_multipliers = multipliers
+        asset_info.multipliers_update_time = now
+        asset_info.pending_multipliers = None
 
     def stop(self, name):
         asset_info = self.assets.get(name)
         if asset_info == None:
             print("Asset not found: ", name)
             return
-        asset_info = self.assets[name]
-        print("Stop:", asset_info.name)
+        # drop pending changes, skip stop if asset is not playing
+        asset_info.pending_multipliers = None
+        self.dirty_assets.pop(name, None)
+        if not asset_info.is_playing:
+            self.__count_saved_call()
+            return
+        if asset_info.is_play_pending:
+            asset_info.is_play_pending = False
+            asset_info.is_playing = False
+            self.__count_saved_call()
+            return
         asset_info.is_playing = False
-        self.player.stop_playable(asset_info.playable_id)
+        self.__call_sdk("stop", self.player.stop_playable, asset_info.playable_id)
+
+    def __count_saved_call(self):
+        self.sdk_calls_saved += 1
+        if self.stats != None:
+            self.stats.count("sdk.saved")
+
+    def __call_sdk(self, name, function, *args):
+        self.sdk_calls += 1
+        if self.stats == None:
+            function(*args)
+            return
+        start_time = time.perf_counter()
+        function(*args)
+        self.stats.record("sdk_call", time.perf_counter() - start_time)
+        self.stats.count("sdk." + name)
 
 
 class TsAssetInfo:
@@ -66,4 +179,8 @@ class TsAssetInfo:
         self.asset_handle = asset_handle
         self.playable_id = playable_id
         self.is_playing = False
+        self.is_play_pending = False
+        self.pending_multipliers = None
+        self.applied_multipliers = None
+        self.multipliers_update_time = float(0)
         
\ No newline at end of file